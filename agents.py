@@ -0,0 +1,137 @@
+from typing import Any, Iterable, List, Sequence
+
+import numpy as np
+
+# 路线缓冲区的初始长度
+ROUTE_BUFFER_CHUNK = 1 << 16
+
+
+class AgentStore:
+    """大规模学生的结构化数组存储：每个字段一个NumPy数组，按学生下标索引
+
+    路线统一存放在一条边编号缓冲区里，每个学生记录自己路线的 [当前下标, 终点)。
+    step() 对所有学生一次性完成插值、缓动、到达检测和换边，不创建任何Point对象。
+    作为Simulation(vectorized=True)的位置后端使用；NumPy只在这时才需要。
+    """
+
+    def __init__(self, graph: Any, count: int, time_weight: str = 'fastest'):
+        self.graph = graph
+        self.count = count
+        # 路网几何：按边编号索引
+        sources = np.array(graph.edge_sources, dtype=np.int64)
+        targets = np.array(graph.edge_targets, dtype=np.int64)
+        xs = np.array(graph.xs, dtype=np.float64)
+        ys = np.array(graph.ys, dtype=np.float64)
+        self.edge_x0, self.edge_y0 = xs[sources], ys[sources]
+        self.edge_x1, self.edge_y1 = xs[targets], ys[targets]
+        # 用时为0的路段按极短时间处理，走到时立刻换边
+        self.edge_time = np.maximum(np.array(graph.edge_costs(time_weight), dtype=np.float64), 1e-9)
+
+        # 学生状态
+        self.current_edge = np.full(count, -1, dtype=np.int64)  # -1表示没有在走路
+        self.progress = np.zeros(count, dtype=np.float64)  # 当前路段走过的比例（上一次step时）
+        self.edge_offset = np.zeros(count, dtype=np.float64)  # 开始计时前已走过的比例
+        self.move_start_time = np.zeros(count, dtype=np.float64)
+        self.x = np.zeros(count, dtype=np.float64)
+        self.y = np.zeros(count, dtype=np.float64)
+
+        # 路线缓冲区
+        self.route_edges = np.zeros(ROUTE_BUFFER_CHUNK, dtype=np.int64)
+        self.route_size = 0
+        self.route_cursor = np.zeros(count, dtype=np.int64)
+        self.route_end = np.zeros(count, dtype=np.int64)
+
+    def place(self, agents: Sequence[int], xs: Sequence[float], ys: Sequence[float]):
+        """让学生停在给定坐标（不再走路）"""
+        agents = np.asarray(agents, dtype=np.int64)
+        self.current_edge[agents] = -1
+        self.route_end[agents] = self.route_cursor[agents]
+        self.x[agents] = xs
+        self.y[agents] = ys
+
+    def _reserve(self, extra: int):
+        """保证缓冲区末尾还有extra格；放不下时先丢掉走完的路线，仍不够再扩容"""
+        if self.route_size + extra <= len(self.route_edges):
+            return
+        self.compact()
+        if self.route_size + extra > len(self.route_edges):
+            grown = np.zeros(max(2 * len(self.route_edges), self.route_size + extra), dtype=np.int64)
+            grown[:self.route_size] = self.route_edges[:self.route_size]
+            self.route_edges = grown
+
+    def compact(self):
+        """丢掉已经走完的路线，把还在用的部分挪到缓冲区开头"""
+        remaining = np.maximum(self.route_end - self.route_cursor, 0)
+        active = np.nonzero(remaining)[0]
+        lengths = remaining[active]
+        new_starts = np.cumsum(lengths) - lengths
+        total = int(lengths.sum())
+        # 每个元素在旧缓冲区中的位置
+        positions = np.repeat(self.route_cursor[active] - new_starts, lengths) + np.arange(total)
+        self.route_edges[:total] = self.route_edges[positions]
+        self.route_size = total
+        self.route_cursor[:] = 0
+        self.route_end[:] = 0
+        self.route_cursor[active] = new_starts
+        self.route_end[active] = new_starts + lengths
+
+    def _append_routes(self, routes: List[np.ndarray]) -> np.ndarray:
+        """把路线依次写进缓冲区，返回每条路线的起始下标"""
+        lengths = np.array([len(route) for route in routes], dtype=np.int64)
+        total = int(lengths.sum())
+        self._reserve(total)
+        starts = self.route_size + np.cumsum(lengths) - lengths
+        if total:
+            self.route_edges[self.route_size:self.route_size + total] = np.concatenate(routes)
+        self.route_size += total
+        return starts
+
+    def assign_routes(self, agents: Sequence[int], routes: Iterable[Sequence[int]], start_times: Any, offsets: Sequence[float]):
+        """给一批学生分配路线（边编号序列），第一段从start_times（一个时刻或每人一个）开始计时，
+        开始计时前已走过offsets；路线不能为空"""
+        agents = np.asarray(agents, dtype=np.int64)
+        routes = [np.asarray(route, dtype=np.int64) for route in routes]
+        starts = self._append_routes(routes)
+        self.route_cursor[agents] = starts
+        self.route_end[agents] = starts + [len(route) for route in routes]
+        self.current_edge[agents] = self.route_edges[starts]
+        self.move_start_time[agents] = start_times
+        self.edge_offset[agents] = offsets
+        self.progress[agents] = offsets
+
+    def step(self, now: float) -> np.ndarray:
+        """把所有学生推进到now：插值、缓动、到达检测和换边一次完成，返回这一步走到终点的学生下标"""
+        finished: List[np.ndarray] = []
+        walking = np.nonzero(self.current_edge >= 0)[0]
+        while len(walking):
+            edges = self.current_edge[walking]
+            progress = self.edge_offset[walking] + (now - self.move_start_time[walking]) / self.edge_time[edges]
+            arrived = progress >= 1.0
+            self.progress[walking] = np.minimum(progress, 1.0)
+            if not arrived.any():
+                break
+            # 走完这一段的学生换到路线的下一段，多出来的时间算在下一段上
+            done = walking[arrived]
+            done_edges = edges[arrived]
+            overshoot = (progress[arrived] - 1.0) * self.edge_time[done_edges]
+            self.route_cursor[done] += 1
+            more = self.route_cursor[done] < self.route_end[done]
+            next_agents = done[more]
+            self.current_edge[next_agents] = self.route_edges[self.route_cursor[next_agents]]
+            self.move_start_time[next_agents] = now - overshoot[more]
+            self.edge_offset[next_agents] = 0.0
+            self.progress[next_agents] = 0.0
+            last = done[~more]
+            self.x[last] = self.edge_x1[done_edges[~more]]
+            self.y[last] = self.edge_y1[done_edges[~more]]
+            self.current_edge[last] = -1
+            finished.append(last)
+            walking = next_agents
+
+        moving = np.nonzero(self.current_edge >= 0)[0]
+        edges = self.current_edge[moving]
+        t = self.progress[moving]
+        eased = t * t * (3 - 2 * t)
+        self.x[moving] = self.edge_x0[edges] + (self.edge_x1[edges] - self.edge_x0[edges]) * eased
+        self.y[moving] = self.edge_y0[edges] + (self.edge_y1[edges] - self.edge_y0[edges]) * eased
+        return np.concatenate(finished) if finished else np.zeros(0, dtype=np.int64)
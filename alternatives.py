@@ -0,0 +1,80 @@
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from profiles import DEFAULT_PROFILE
+
+# 候选路线比最短路线长出这个比例以内才分配给学生，避免绕远路
+MAX_DETOUR = 0.2
+
+
+def _restricted_search(graph: Any, source: int, target: int, weight: str, banned_nodes: Set[int], banned_next: Set[int]) -> Optional[Tuple[float, List[int]]]:
+    """不经过banned_nodes、第一步不走到banned_next的点对点Dijkstra，返回 (代价, 边编号列表)"""
+    offsets, targets, edge_ids, costs = graph.csr(weight)
+    distances: Dict[int, float] = {source: 0.0}
+    predecessors: Dict[int, int] = {}
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        if node == target:
+            path = []
+            while node != source:
+                edge_id = predecessors[node]
+                path.append(edge_id)
+                node = graph.edge_sources[edge_id]
+            path.reverse()
+            return distance, path
+        for k in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[k]
+            if neighbor in banned_nodes or (node == source and neighbor in banned_next):
+                continue
+            candidate = distance + costs[k]
+            if candidate < distances.get(neighbor, math.inf):
+                distances[neighbor] = candidate
+                predecessors[neighbor] = edge_ids[k]
+                heapq.heappush(queue, (candidate, neighbor))
+    return None
+
+
+def k_shortest_paths(graph: Any, source: int, target: int, k: int, weight: str = DEFAULT_PROFILE) -> List[Tuple[float, List[int]]]:
+    """Yen算法：按代价从小到大返回最多k条无环路线 (代价, 边编号列表)
+
+    路线按经过的节点区分，两点之间的平行路径只取代价最小的一条。
+    """
+    if source == target or k <= 0:
+        return []
+    first = _restricted_search(graph, source, target, weight, set(), set())
+    if first is None:
+        return []
+    edge_costs = graph.edge_costs(weight)
+
+    def node_sequence(path: List[int]) -> Tuple[int, ...]:
+        return (source,) + tuple(graph.edge_targets[edge_id] for edge_id in path)
+
+    found = [first]
+    found_nodes = [node_sequence(first[1])]
+    seen = set(found_nodes)
+    candidates: List[Tuple[float, Tuple[int, ...]]] = []
+    while len(found) < k:
+        previous = found[-1][1]
+        nodes = found_nodes[-1]
+        root_cost = 0.0
+        for i, spur in enumerate(nodes[:-1]):
+            # 已找到的路线中与当前路线共用这段前缀的，下一个节点都不能再走
+            banned_next = {other[i + 1] for other in found_nodes if len(other) > i + 1 and other[:i + 1] == nodes[:i + 1]}
+            spur_path = _restricted_search(graph, spur, target, weight, set(nodes[:i]), banned_next)
+            if spur_path is not None:
+                path = tuple(previous[:i]) + tuple(spur_path[1])
+                sequence = node_sequence(list(path))
+                if sequence not in seen:
+                    seen.add(sequence)
+                    heapq.heappush(candidates, (root_cost + spur_path[0], path))
+            root_cost += edge_costs[previous[i]]
+        if not candidates:
+            break
+        cost, path = heapq.heappop(candidates)
+        found.append((cost, list(path)))
+        found_nodes.append(node_sequence(found[-1][1]))
+    return found
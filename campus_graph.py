@@ -0,0 +1,1025 @@
+import heapq
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from alternatives import MAX_DETOUR, k_shortest_paths
+from compiler import CompiledGraph
+from components import UnionFind
+from contraction import ContractionHierarchy
+from landmarks import LandmarkTable, landmark_file, map_version
+from profiles import DEFAULT_PROFILE, cost_function
+from snapping import GridIndex, NodeMerge
+from transit import TransitRouter
+
+INF = math.inf
+
+
+@dataclass(frozen=True)
+class Route:
+    """两栋建筑之间预先计算好的路线"""
+    distance: float
+    time_cost: float
+    edges: Tuple[Any, ...]
+    cost: float = 0.0  # 按所用偏好计算的总代价
+    edge_ids: Tuple[int, ...] = ()
+
+
+@dataclass(frozen=True)
+class EdgePosition:
+    """路段中间的位置：沿边edge_id的方向已经走过offset（0到1之间的比例）"""
+    __slots__ = ('edge_id', 'offset')
+    edge_id: int
+    offset: float
+
+
+@dataclass
+class Isochrone:
+    """从origin出发在budget内能到达的范围
+
+    reached: 节点编号 -> 到达代价；
+    edges: (边编号, 可走到的比例)，比例为1表示整条路都在范围内，小于1时从边的起点走这么远；
+    buildings: 范围内的建筑名。
+    """
+    origin: int
+    budget: float
+    reached: Dict[int, float]
+    edges: List[Tuple[int, float]]
+    buildings: List[str]
+
+
+class ShortestPathTree:
+    """单源最短路径树：每个节点只保存到达它的前驱边编号，需要时再回溯出路线"""
+
+    def __init__(self, graph: 'CampusGraph', source: int, distances: List[float], predecessors: List[int], settled: bytearray):
+        self.graph = graph
+        self.source = source
+        self.distances = distances  # 按节点编号索引
+        self.predecessors = predecessors  # 到达该节点的边编号，-1表示没有
+        self.settled = settled  # 1表示距离已经确定
+
+    @property
+    def settled_count(self) -> int:
+        """已确定距离的节点数，即搜索访问过的节点数"""
+        return self.settled.count(1)
+
+    def __contains__(self, point: Any) -> bool:
+        node = self.graph.node_id(point)
+        return node is not None and self.settled[node] == 1
+
+    def distance_to(self, target: Any) -> Optional[float]:
+        """到target的最短距离，未确定时返回None"""
+        node = self.graph.node_id(target)
+        if node is None or not self.settled[node]:
+            return None
+        return self.distances[node]
+
+    def edge_ids_to(self, node: int) -> List[int]:
+        """按节点编号回溯出边编号序列，多起点搜索时回溯到所属的起点为止"""
+        if not self.settled[node]:
+            return []
+        edge_sources = self.graph.edge_sources
+        edge_ids = []
+        while self.predecessors[node] != -1:
+            edge_id = self.predecessors[node]
+            edge_ids.append(edge_id)
+            node = edge_sources[edge_id]
+        edge_ids.reverse()
+        return edge_ids
+
+    def path_to(self, target: Any) -> List[Any]:
+        """从前驱边回溯出到target的路线，不可达时返回空列表"""
+        node = self.graph.node_id(target)
+        if node is None:
+            return []
+        edge_list = self.graph.edge_list
+        return [edge_list[edge_id] for edge_id in self.edge_ids_to(node)]
+
+
+class CampusGraph:
+    """校园路网图：加载数据时构建一次，所有学生共享同一个实例
+
+    每个坐标在加载时映射成整数节点编号，邻接关系按CSR压缩存放在array里，
+    搜索循环只处理整数和浮点数，Point和Path只在入口和出口转换。
+    snap_tolerance大于0时，距离不超过它的手工描点会合并成同一个节点。
+    """
+
+    def __init__(self, paths: Iterable[Any], snap_tolerance: float = 0.0):
+        self.paths: List[Any] = list(paths)
+        self.snap_tolerance = snap_tolerance
+        # 加载时的合并记录，以及两端被合并到同一节点而丢弃的路径
+        self.merges: List[NodeMerge] = []
+        self.dropped_paths: List[Any] = []
+        self._merge_index = GridIndex(snap_tolerance) if snap_tolerance > 0 else None
+        # 节点编号：(x, y) -> 编号；编号 -> 坐标点
+        self.node_ids: Dict[Tuple[float, float], int] = {}
+        self.node_points: List[Any] = []
+        self.xs = array('d')
+        self.ys = array('d')
+        # 有向边：下标即边编号，反向路径只在这里创建一次
+        self.edge_list: List[Any] = []
+        self.edge_sources = array('l')
+        self.edge_targets = array('l')
+        # 路径对象 -> 边编号
+        self.edge_index: Dict[Any, int] = {}
+        # 边索引：(起点编号, 终点编号) -> 该方向上最短的一条路径
+        self.edges: Dict[Tuple[int, int], Any] = {}
+        # 建筑之间的路线表，每种偏好一张：偏好 -> {(起点建筑, 终点建筑): Route}
+        self.route_tables: Dict[str, Dict[Tuple[str, str], Route]] = {}
+        self.building_names: Dict[int, str] = {}
+        self.building_nodes: Dict[str, int] = {}
+        # 建筑之间的前k条备选路线：偏好 -> {(起点建筑, 终点建筑, k): [Route, ...]}
+        self.alternative_tables: Dict[str, Dict[Tuple[str, str, int], List[Route]]] = {}
+        # 每对建筑下一次分配到第几条备选路线：(偏好, 起点建筑, 终点建筑) -> 序号
+        self._alternative_turns: Dict[Tuple[str, str, str], int] = {}
+        # A*启发函数的比例系数缓存：权重名 -> 每单位直线距离的最小代价
+        self._heuristic_scales: Dict[str, float] = {}
+        # CSR代价数组缓存：(权重名, 是否反向) -> array
+        self._cost_arrays: Dict[Tuple[str, bool], array] = {}
+        # 按边编号存放的代价数组：权重名 -> array，register_profile注册的动态代价也放在这里
+        self._edge_costs: Dict[str, array] = {}
+        # ALT地标表：权重名 -> LandmarkTable
+        self.landmark_tables: Dict[str, LandmarkTable] = {}
+        # 地图文件路径，设置后ALT第一次用到地标表时在它旁边读写缓存
+        self.landmark_map_file: Optional[str] = None
+        # 收缩层次：权重名 -> ContractionHierarchy，大地图上可选用
+        self.contraction_hierarchies: Dict[str, ContractionHierarchy] = {}
+        # 运行时封闭的边编号，封闭的边在所有偏好下代价都视为无穷大
+        self.closed_edges: Set[int] = set()
+        # 连通分量，封闭道路后置为None，下次查询时重建
+        self._components: Optional[UnionFind] = None
+        # 合并平行边、收起度为2的链之后的精简路网，调用compile_graph后才有
+        self.compiled: Optional[CompiledGraph] = None
+        # 过境节点路由：分隔边（河上的桥）的边编号，以及按权重名缓存的TransitRouter
+        self.transit_separators: Set[int] = set()
+        self.transit_routers: Dict[str, TransitRouter] = {}
+        # route() 没有指定寻路方式时使用的默认方式
+        self.default_method = 'dijkstra'
+        for path in self.paths:
+            if self._intern(path.start) == self._intern(path.end):
+                self.dropped_paths.append(path)
+                continue
+            self._add_edge(path)
+            self._add_edge(path.reverse())
+        self._build_csr()
+        self._build_spatial_index()
+
+    def _intern(self, point: Any) -> int:
+        """把坐标点映射为节点编号，容差内已有节点时直接并入"""
+        key = (point.x, point.y)
+        node = self.node_ids.get(key)
+        if node is not None:
+            return node
+        if self._merge_index is not None:
+            hit = self._merge_index.nearest(point.x, point.y, self.snap_tolerance)
+            if hit is not None:
+                node, distance = hit
+                self.node_ids[key] = node
+                self.merges.append(NodeMerge(point, self.node_points[node], distance))
+                return node
+        node = len(self.node_points)
+        self.node_ids[key] = node
+        self.node_points.append(point)
+        self.xs.append(point.x)
+        self.ys.append(point.y)
+        if self._merge_index is not None:
+            self._merge_index.insert(node, point.x, point.y)
+        return node
+
+    def _add_edge(self, edge: Any):
+        """把一条有向路径加入边表和边索引"""
+        start = self._intern(edge.start)
+        end = self._intern(edge.end)
+        self.edge_index[edge] = len(self.edge_list)
+        self.edge_list.append(edge)
+        self.edge_sources.append(start)
+        self.edge_targets.append(end)
+        key = (start, end)
+        if key not in self.edges or edge.length < self.edges[key].length:
+            self.edges[key] = edge
+
+    @staticmethod
+    def _compress(keys: array, values: array, count: int) -> Tuple[array, array, array]:
+        """按keys分桶，得到 (offsets, 相邻节点, 边编号) 三个CSR数组"""
+        offsets = array('l', [0]) * (count + 1)
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        fill = array('l', offsets[:-1])
+        targets = array('l', [0]) * len(keys)
+        edge_ids = array('l', [0]) * len(keys)
+        for edge_id, key in enumerate(keys):
+            position = fill[key]
+            targets[position] = values[edge_id]
+            edge_ids[position] = edge_id
+            fill[key] = position + 1
+        return offsets, targets, edge_ids
+
+    def _build_csr(self):
+        count = len(self.node_points)
+        self.offsets, self.targets, self.csr_edge_ids = self._compress(self.edge_sources, self.edge_targets, count)
+        self.reverse_offsets, self.reverse_targets, self.reverse_edge_ids = self._compress(self.edge_targets, self.edge_sources, count)
+        # 边编号 -> 在正向/反向CSR中的位置，修改单条边的代价时用
+        self.csr_positions = array('l', [0]) * len(self.edge_list)
+        self.reverse_csr_positions = array('l', [0]) * len(self.edge_list)
+        for position, edge_id in enumerate(self.csr_edge_ids):
+            self.csr_positions[edge_id] = position
+        for position, edge_id in enumerate(self.reverse_edge_ids):
+            self.reverse_csr_positions[edge_id] = position
+
+    def _build_spatial_index(self):
+        """按节点密度选格子大小，使每个格子平均约一个节点"""
+        count = len(self.node_points)
+        cell_size = self.snap_tolerance
+        if count:
+            width = max(self.xs) - min(self.xs)
+            height = max(self.ys) - min(self.ys)
+            # 节点几乎共线时按长边估计面积，避免格子过小
+            span = max(width, height) / count
+            cell_size = max(cell_size, math.sqrt(max(width, span) * max(height, span) / count), 1e-9)
+        self.spatial_index = GridIndex(cell_size or 1.0)
+        for node in range(count):
+            self.spatial_index.insert(node, self.xs[node], self.ys[node])
+
+    def edge_costs(self, weight: str = DEFAULT_PROFILE) -> array:
+        """按边编号索引的代价数组"""
+        if weight not in self._edge_costs:
+            cost = cost_function(weight)
+            self._edge_costs[weight] = array('d', (cost(edge) for edge in self.edge_list))
+        return self._edge_costs[weight]
+
+    def costs(self, weight: str = DEFAULT_PROFILE, reverse: bool = False) -> array:
+        """与CSR位置对齐的边代价数组，已封闭的边为无穷大"""
+        key = (weight, reverse)
+        if key not in self._cost_arrays:
+            edge_ids = self.reverse_edge_ids if reverse else self.csr_edge_ids
+            edge_costs = self.edge_costs(weight)
+            closed = self.closed_edges
+            self._cost_arrays[key] = array('d', (INF if edge_id in closed else edge_costs[edge_id] for edge_id in edge_ids))
+        return self._cost_arrays[key]
+
+    def current_cost(self, edge_id: int, weight: str = DEFAULT_PROFILE) -> float:
+        """考虑封闭状态后的单条边代价"""
+        if edge_id in self.closed_edges:
+            return INF
+        return self.edge_costs(weight)[edge_id]
+
+    def register_profile(self, name: str, edge_costs: Iterable[float]):
+        """注册或更新一种按边编号给出代价的偏好（例如拥堵后的用时），并清掉它的旧缓存"""
+        costs = array('d', edge_costs)
+        if len(costs) != len(self.edge_list):
+            raise ValueError(f"代价数量 {len(costs)} 与边数 {len(self.edge_list)} 不一致")
+        self._edge_costs[name] = costs
+        for key in [(name, False), (name, True)]:
+            self._cost_arrays.pop(key, None)
+        self._heuristic_scales.pop(name, None)
+        self.transit_routers.pop(name, None)
+        if self.compiled is not None:
+            self.compiled.invalidate(name)
+        self.landmark_tables.pop(name, None)
+        self.contraction_hierarchies.pop(name, None)
+        self.route_tables.pop(name, None)
+
+    def csr(self, weight: str = DEFAULT_PROFILE, reverse: bool = False) -> Tuple[array, array, array, array]:
+        """返回 (offsets, 相邻节点, 边编号, 代价)；reverse为True时是反向图"""
+        if reverse:
+            return self.reverse_offsets, self.reverse_targets, self.reverse_edge_ids, self.costs(weight, True)
+        return self.offsets, self.targets, self.csr_edge_ids, self.costs(weight)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_points)
+
+    def node_id(self, point: Any) -> Optional[int]:
+        """坐标点对应的节点编号；坐标不完全一致时在合并容差内找最近节点，都没有则返回None"""
+        node = self.node_ids.get((point.x, point.y))
+        if node is None and self.snap_tolerance > 0:
+            hit = self.spatial_index.nearest(point.x, point.y, self.snap_tolerance)
+            if hit is not None:
+                node = hit[0]
+        return node
+
+    def nearest_node(self, point: Any, max_distance: float = INF) -> Optional[Any]:
+        """离point最近的图节点，平均O(1)；max_distance内没有节点时返回None"""
+        hit = self.spatial_index.nearest(point.x, point.y, max_distance)
+        return self.node_points[hit[0]] if hit is not None else None
+
+    @property
+    def components(self) -> UnionFind:
+        """按未封闭的边合并出的连通分量"""
+        if self._components is None:
+            components = UnionFind(len(self.node_points))
+            closed = self.closed_edges
+            for edge_id in range(len(self.edge_list)):
+                if edge_id not in closed:
+                    components.union(self.edge_sources[edge_id], self.edge_targets[edge_id])
+            self._components = components
+        return self._components
+
+    def connected(self, start_id: int, end_id: int) -> bool:
+        """O(1)判断两个节点是否可能连通，不连通的点对不用再搜索
+
+        分量按无向图计算；只封闭单个方向时结果偏保守，仍会交给搜索判断。
+        """
+        return self.components.connected(start_id, end_id)
+
+    def isolated_buildings(self) -> List[str]:
+        """不在主连通分量（包含建筑最多的分量）里的建筑"""
+        groups: Dict[int, List[str]] = {}
+        for name, node in self.building_nodes.items():
+            groups.setdefault(self.components.find(node), []).append(name)
+        if len(groups) <= 1:
+            return []
+        main = max(groups, key=lambda root: (len(groups[root]), self.components.size[root]))
+        return sorted(name for root, names in groups.items() if root != main for name in names)
+
+    def connectivity_report(self) -> str:
+        """连通性检查结果"""
+        isolated = self.isolated_buildings()
+        if not isolated:
+            return "所有建筑互相连通"
+        return f"以下 {len(isolated)} 栋建筑与主路网不连通: " + ', '.join(isolated)
+
+    def merge_report(self) -> str:
+        """加载时合并节点的情况"""
+        lines = [f"合并了 {len(self.merges)} 个相近坐标，丢弃了 {len(self.dropped_paths)} 条退化路径"]
+        for merge in self.merges:
+            lines.append(f"  {merge.point} -> {merge.target} (距离 {merge.distance:.4f})")
+        for path in self.dropped_paths:
+            lines.append(f"  丢弃路径 {path.id}: {path.start} -> {path.end}")
+        return '\n'.join(lines)
+
+    def __contains__(self, point: Any) -> bool:
+        return self.node_id(point) is not None
+
+    @property
+    def nodes(self) -> List[Any]:
+        """图中所有节点，下标即节点编号"""
+        return list(self.node_points)
+
+    def neighbors(self, point: Any) -> List[Tuple[Any, Any]]:
+        """返回节点的所有出边 [(邻居节点, 路径)]"""
+        node = self.node_id(point)
+        if node is None:
+            return []
+        return [
+            (self.node_points[self.targets[k]], self.edge_list[self.csr_edge_ids[k]])
+            for k in range(self.offsets[node], self.offsets[node + 1])
+        ]
+
+    def get_edge(self, start: Any, end: Any) -> Optional[Any]:
+        """查找两个相邻节点之间的路径，不存在时返回None"""
+        start_id = self.node_id(start)
+        end_id = self.node_id(end)
+        if start_id is None or end_id is None:
+            return None
+        return self.edges.get((start_id, end_id))
+
+    def dijkstra(self, source: int, target: int = -1, weight: str = DEFAULT_PROFILE, reverse: bool = False, stop_at: Optional[Iterable[int]] = None) -> Tuple[List[float], List[int], bytearray]:
+        """整数编号上的Dijkstra，返回 (距离, 前驱边编号, 已确定标记)
+
+        target为-1且没有stop_at时搜索整张图；给定stop_at时这些节点都确定后停止。
+        """
+        return self.multi_source_dijkstra({source: 0.0}, target, weight, reverse, stop_at)
+
+    def multi_source_dijkstra(self, sources: Dict[int, float], target: int = -1, weight: str = DEFAULT_PROFILE, reverse: bool = False, stop_at: Optional[Iterable[int]] = None) -> Tuple[List[float], List[int], bytearray]:
+        """多起点Dijkstra：sources为 起点编号 -> 初始代价，其余同dijkstra"""
+        pending = set(stop_at) if stop_at is not None else None
+        offsets, targets, edge_ids, costs = self.csr(weight, reverse)
+        count = len(self.node_points)
+        distances = [INF] * count
+        predecessors = [-1] * count
+        settled = bytearray(count)
+        queue = []
+        for source, distance in sources.items():
+            if distance < distances[source]:
+                distances[source] = distance
+                queue.append((distance, source))
+        heapq.heapify(queue)
+        while queue:
+            current_distance, node = heapq.heappop(queue)
+            if settled[node]:
+                continue
+            settled[node] = 1
+            if node == target:
+                break
+            if pending is not None:
+                pending.discard(node)
+                if not pending:
+                    break
+            for k in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[k]
+                if settled[neighbor]:
+                    continue
+                distance = current_distance + costs[k]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    predecessors[neighbor] = edge_ids[k]
+                    heapq.heappush(queue, (distance, neighbor))
+        return distances, predecessors, settled
+
+    def shortest_path_tree(self, source: Any, target: Optional[Any] = None, weight: str = DEFAULT_PROFILE) -> ShortestPathTree:
+        """单源Dijkstra，只记录前驱边而不复制路径；给定target时到达即停止"""
+        source_id = self.node_id(source)
+        target_id = self.node_id(target) if target is not None else -1
+        if target_id is None:
+            target_id = -1
+        if source_id is None:
+            count = len(self.node_points)
+            return ShortestPathTree(self, -1, [INF] * count, [-1] * count, bytearray(count))
+        return ShortestPathTree(self, source_id, *self.dijkstra(source_id, target_id, weight))
+
+    def isochrone(self, start: Any, budget: float, weight: str = 'fastest') -> Isochrone:
+        """等时圈：budget（默认按time_cost计，单位秒）以内可到达的节点和路段
+
+        搜索在代价超过budget时停止，只访问范围内的节点，用字典而不是整图数组，
+        范围小时开销与范围大小成正比。拥堵时传入CONGESTED_PROFILE即可。
+        """
+        origin = self.node_id(start)
+        if origin is None:
+            return Isochrone(-1, budget, {}, [], [])
+        offsets, targets, edge_ids, costs = self.csr(weight)
+        reached: Dict[int, float] = {}
+        distances = {origin: 0.0}
+        queue = [(0.0, origin)]
+        edges: List[Tuple[int, float]] = []
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node in reached:
+                continue
+            if distance > budget:
+                break
+            reached[node] = distance
+            remaining = budget - distance
+            for k in range(offsets[node], offsets[node + 1]):
+                cost = costs[k]
+                if cost == INF:
+                    continue
+                edges.append((edge_ids[k], min(1.0, remaining / cost) if cost > 0 else 1.0))
+                neighbor = targets[k]
+                candidate = distance + cost
+                if candidate <= budget and candidate < distances.get(neighbor, INF):
+                    distances[neighbor] = candidate
+                    heapq.heappush(queue, (candidate, neighbor))
+        buildings = [self.building_names[node] for node in reached if node in self.building_names]
+        return Isochrone(origin, budget, reached, edges, buildings)
+
+    def heuristic_scale(self, weight: str = DEFAULT_PROFILE) -> float:
+        """所有路径中每单位直线距离的最小代价，乘以直线距离即得到可采纳的启发值"""
+        if weight not in self._heuristic_scales:
+            scale = INF
+            edge_costs = self.edge_costs(weight)
+            xs, ys = self.xs, self.ys
+            for edge_id in range(len(self.edge_list)):
+                start, end = self.edge_sources[edge_id], self.edge_targets[edge_id]
+                straight = math.hypot(xs[end] - xs[start], ys[end] - ys[start])
+                if straight > 0:
+                    scale = min(scale, edge_costs[edge_id] / straight)
+            self._heuristic_scales[weight] = scale if scale != INF else 0.0
+        return self._heuristic_scales[weight]
+
+    def euclidean_heuristic(self, target: int, weight: str = DEFAULT_PROFILE) -> Callable[[int], float]:
+        """直线距离启发函数，参数为节点编号"""
+        scale = self.heuristic_scale(weight)
+        xs, ys = self.xs, self.ys
+        target_x, target_y = xs[target], ys[target]
+        hypot = math.hypot
+        return lambda node: scale * hypot(xs[node] - target_x, ys[node] - target_y)
+
+    def astar(self, source: int, target: int, weight: str = DEFAULT_PROFILE, heuristic: Optional[Callable[[int], float]] = None) -> Tuple[List[float], List[int], bytearray]:
+        """整数编号上的A*，默认用直线距离启发函数，到达target即停止"""
+        if heuristic is None:
+            heuristic = self.euclidean_heuristic(target, weight)
+        offsets, targets, edge_ids, costs = self.csr(weight)
+        count = len(self.node_points)
+        distances = [INF] * count
+        predecessors = [-1] * count
+        settled = bytearray(count)
+        distances[source] = 0.0
+        queue = [(heuristic(source), source)]
+        while queue:
+            _, node = heapq.heappop(queue)
+            if settled[node]:
+                continue
+            settled[node] = 1
+            if node == target:
+                break
+            current_distance = distances[node]
+            for k in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[k]
+                if settled[neighbor]:
+                    continue
+                distance = current_distance + costs[k]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    predecessors[neighbor] = edge_ids[k]
+                    heapq.heappush(queue, (distance + heuristic(neighbor), neighbor))
+        return distances, predecessors, settled
+
+    def astar_tree(self, source: Any, target: Any, weight: str = DEFAULT_PROFILE) -> ShortestPathTree:
+        """A*搜索，用直线距离乘以最小单位代价作为启发函数，到达target即停止"""
+        source_id, target_id = self.node_id(source), self.node_id(target)
+        if source_id is None or target_id is None:
+            return self.shortest_path_tree(source, target, weight)
+        return ShortestPathTree(self, source_id, *self.astar(source_id, target_id, weight))
+
+    def prepare_landmarks(self, map_file: Optional[str] = None, count: int = 4, weight: str = DEFAULT_PROFILE) -> LandmarkTable:
+        """ALT预处理：优先读取地图旁边的地标文件，版本不一致时重新计算并保存"""
+        map_file = map_file or self.landmark_map_file
+        version = map_version(self, weight)
+        table = None
+        if map_file:
+            table = LandmarkTable.load(landmark_file(map_file, weight), self, version, weight)
+        if table is None:
+            table = LandmarkTable.build(self, count, weight)
+            if map_file:
+                table.save(landmark_file(map_file, weight), self, version)
+        self.landmark_tables[weight] = table
+        return table
+
+    def alt_tree(self, source: Any, target: Any, weight: str = DEFAULT_PROFILE) -> ShortestPathTree:
+        """ALT搜索：A*使用地标三角不等式和直线距离中较大的下界"""
+        source_id, target_id = self.node_id(source), self.node_id(target)
+        if source_id is None or target_id is None:
+            return self.shortest_path_tree(source, target, weight)
+        table = self.landmark_tables.get(weight) or self.prepare_landmarks(weight=weight)
+        landmark_bound = table.heuristic(target_id)
+        euclidean = self.euclidean_heuristic(target_id, weight)
+        heuristic = lambda node: max(landmark_bound(node), euclidean(node))
+        return ShortestPathTree(self, source_id, *self.astar(source_id, target_id, weight, heuristic))
+
+    def contraction_hierarchy(self, weight: str = DEFAULT_PROFILE) -> ContractionHierarchy:
+        """某种偏好下的收缩层次，第一次用到时构建；不改变默认寻路方式"""
+        if weight not in self.contraction_hierarchies:
+            self.contraction_hierarchies[weight] = ContractionHierarchy(self, weight)
+        return self.contraction_hierarchies[weight]
+
+    def use_contraction_hierarchy(self, weight: str = DEFAULT_PROFILE) -> ContractionHierarchy:
+        """构建收缩层次并把它设为 route() 和 route_many() 的默认寻路方式"""
+        hierarchy = self.contraction_hierarchy(weight)
+        self.default_method = 'ch'
+        return hierarchy
+
+    def compile_graph(self, keep: Iterable[Any] = ()) -> CompiledGraph:
+        """编译精简路网，建筑和keep里的点不会被收掉；不改变默认寻路方式"""
+        kept = set(self.building_nodes.values())
+        kept.update(node for node in map(self.node_id, keep) if node is not None)
+        self.compiled = CompiledGraph(self, kept)
+        return self.compiled
+
+    def use_compiled_graph(self, keep: Iterable[Any] = ()) -> CompiledGraph:
+        """编译精简路网并把它设为 route() 和 route_many() 的默认寻路方式"""
+        compiled = self.compile_graph(keep)
+        self.default_method = 'compiled'
+        return compiled
+
+    def use_transit_nodes(self, separators: Iterable[Tuple[Any, Any]], weight: str = DEFAULT_PROFILE) -> TransitRouter:
+        """以separators（桥两端的坐标对）为分隔边构建过境节点路由
+
+        之后 route() 和 route_many() 中跨越分隔边的查询改为查表，同侧查询仍用默认寻路方式，
+        默认寻路方式本身不变。
+        """
+        self.transit_separators = {edge_id for start, end in separators for edge_id in self.edge_ids_between(start, end)}
+        self.transit_routers = {}
+        return self.transit_router(weight)
+
+    def transit_edge_ids(self, start_id: int, end_id: int, weight: str = DEFAULT_PROFILE) -> Optional[Tuple[float, List[int]]]:
+        """配置了过境节点且两点在分隔边两侧时查表得到 (距离, 边编号列表)，否则返回None"""
+        if not self.transit_separators:
+            return None
+        return self.transit_router(weight).query_edge_ids(start_id, end_id)
+
+    def transit_router(self, weight: str = DEFAULT_PROFILE) -> TransitRouter:
+        """某种偏好下的过境节点路由，第一次用到时构建"""
+        if weight not in self.transit_routers:
+            self.transit_routers[weight] = TransitRouter(self, self.transit_separators, weight)
+        return self.transit_routers[weight]
+
+    def bidirectional_edge_ids(self, source: int, target: int, weight: str = DEFAULT_PROFILE) -> Optional[List[int]]:
+        """双向Dijkstra：从起点沿正向、从终点沿反向同时搜索，在中间相遇；不可达时返回None"""
+        count = len(self.node_points)
+        graphs = (self.csr(weight), self.csr(weight, reverse=True))
+        distances = ([INF] * count, [INF] * count)
+        # 正向记录到达节点的边，反向记录离开节点的边
+        links = ([-1] * count, [-1] * count)
+        settled = (bytearray(count), bytearray(count))
+        distances[0][source] = 0.0
+        distances[1][target] = 0.0
+        queues = ([(0.0, source)], [(0.0, target)])
+        best = INF
+        meeting = source if source == target else -1
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            current_distance, node = heapq.heappop(queues[side])
+            side_settled = settled[side]
+            if side_settled[node]:
+                continue
+            side_settled[node] = 1
+            offsets, targets, edge_ids, costs = graphs[side]
+            side_distances, other_distances = distances[side], distances[1 - side]
+            for k in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[k]
+                if side_settled[neighbor]:
+                    continue
+                distance = current_distance + costs[k]
+                if distance < side_distances[neighbor]:
+                    side_distances[neighbor] = distance
+                    links[side][neighbor] = edge_ids[k]
+                    heapq.heappush(queues[side], (distance, neighbor))
+                total = distance + other_distances[neighbor]
+                if total < best:
+                    best = total
+                    meeting = neighbor
+        if meeting == -1:
+            return None
+
+        edge_ids = []
+        node = meeting
+        while node != source:
+            edge_id = links[0][node]
+            edge_ids.append(edge_id)
+            node = self.edge_sources[edge_id]
+        edge_ids.reverse()
+        node = meeting
+        while node != target:
+            edge_id = links[1][node]
+            edge_ids.append(edge_id)
+            node = self.edge_targets[edge_id]
+        return edge_ids
+
+    def bidirectional_path(self, source: Any, target: Any, weight: str = DEFAULT_PROFILE) -> List[Any]:
+        """双向Dijkstra，返回依次经过的路径列表"""
+        source_id, target_id = self.node_id(source), self.node_id(target)
+        if source_id is None or target_id is None:
+            return []
+        edge_ids = self.bidirectional_edge_ids(source_id, target_id, weight)
+        return [self.edge_list[edge_id] for edge_id in edge_ids] if edge_ids else []
+
+    def find_shortest_path(self, start: Any, end: Any, method: str = 'dijkstra', weight: str = DEFAULT_PROFILE) -> List[Any]:
+        """最短路径，返回依次经过的路径列表，不可达时返回空列表
+
+        method: 'dijkstra'、'astar'、'alt'、'bidirectional'、'ch'（收缩层次）、'compiled'（精简路网）
+        或 'transit'（过境节点，跨河查表，同侧搜索）
+        weight: 路线偏好 'shortest'、'fastest'、'least_effort'，或直接用路径属性名
+        """
+        if start == end or start not in self or end not in self:
+            return []
+        if not self.connected(self.node_id(start), self.node_id(end)):
+            return []
+        if method == 'astar':
+            return self.astar_tree(start, end, weight).path_to(end)
+        if method == 'ch':
+            return self.contraction_hierarchy(weight).query(start, end)[1]
+        if method == 'compiled':
+            compiled = self.compiled or self.compile_graph()
+            result = compiled.shortest_edge_ids(self.node_id(start), self.node_id(end), weight)
+            if result is not None:
+                return [self.edge_list[edge_id] for edge_id in result[1]]
+            method = 'dijkstra'  # 端点在超级边中间，改用原图
+        if method == 'transit':
+            result = self.transit_router(weight).query_edge_ids(self.node_id(start), self.node_id(end))
+            if result is not None:
+                return [self.edge_list[edge_id] for edge_id in result[1]]
+            method = 'bidirectional'  # 同侧查询
+        if method == 'alt':
+            return self.alt_tree(start, end, weight).path_to(end)
+        if method == 'bidirectional':
+            return self.bidirectional_path(start, end, weight)
+        if method == 'dijkstra':
+            return self.shortest_path_tree(start, end, weight).path_to(end)
+        raise ValueError(f"未知的寻路方式: {method}")
+
+    def build_route_table(self, buildings: Dict[str, Any], profiles: Iterable[str] = (DEFAULT_PROFILE,)):
+        """预先计算所有建筑两两之间的最短路线，每种偏好一张表，加载数据时调用一次"""
+        self.building_names = {}
+        self.building_nodes = {}
+        self.alternative_tables = {}
+        for name, point in buildings.items():
+            node = self.node_id(point)
+            if node is not None:
+                self.building_names[node] = name
+                self.building_nodes[name] = node
+        for profile in profiles:
+            table = {}
+            for start_name, start in buildings.items():
+                tree = self.shortest_path_tree(start, weight=profile)  # 每个起点只搜索一次
+                for end_name, end in buildings.items():
+                    if start == end:
+                        continue
+                    end_id = self.node_id(end)
+                    edge_ids = tree.edge_ids_to(end_id) if end_id is not None else []
+                    if edge_ids:
+                        table[(start_name, end_name)] = self._make_route(edge_ids, tree.distances[end_id])
+            self.route_tables[profile] = table
+
+    def _make_route(self, edge_ids: List[int], cost: float) -> Route:
+        """由边编号序列构造Route"""
+        edges = [self.edge_list[edge_id] for edge_id in edge_ids]
+        return Route(
+            sum(edge.length for edge in edges),
+            sum(edge.time_cost for edge in edges),
+            tuple(edges),
+            cost,
+            tuple(edge_ids)
+        )
+
+    def get_route(self, start_name: str, end_name: str, profile: str = DEFAULT_PROFILE) -> Optional[Route]:
+        """O(1)查询两栋建筑之间的路线"""
+        return self.route_tables.get(profile, {}).get((start_name, end_name))
+
+    def alternative_routes(self, start_name: str, end_name: str, k: int = 3, profile: str = DEFAULT_PROFILE) -> List[Route]:
+        """两栋建筑之间按代价排序的前k条无环路线，第一次查询时用Yen算法计算并缓存"""
+        table = self.alternative_tables.setdefault(profile, {})
+        key = (start_name, end_name, k)
+        if key not in table:
+            source = self.building_nodes.get(start_name)
+            target = self.building_nodes.get(end_name)
+            routes = []
+            if source is not None and target is not None:
+                for cost, edge_ids in k_shortest_paths(self, source, target, k, profile):
+                    routes.append(self._make_route(edge_ids, cost))
+            table[key] = routes
+        return table[key]
+
+    def choose_alternative(self, start_name: str, end_name: str, k: int = 3, profile: str = DEFAULT_PROFILE) -> Optional[Route]:
+        """在代价不超过最短路线 (1 + MAX_DETOUR) 倍的备选路线中轮流分配，同路的学生因此分散开"""
+        routes = self.alternative_routes(start_name, end_name, k, profile)
+        if not routes:
+            return None
+        limit = routes[0].cost * (1 + MAX_DETOUR)
+        usable = [route for route in routes if route.cost <= limit]
+        turn = (profile, start_name, end_name)
+        index = self._alternative_turns.get(turn, 0)
+        self._alternative_turns[turn] = index + 1
+        return usable[index % len(usable)]
+
+    def edge_position_sources(self, position: EdgePosition, weight: str = DEFAULT_PROFILE) -> Dict[int, float]:
+        """从路段中间出发时的两个起点：继续走到终点，或者掉头走回起点，各自带上剩余代价
+
+        已经在路上的学生可以走完这一段，所以这里用边的原始代价，不管它是否被封闭。
+        """
+        edge_costs = self.edge_costs(weight)
+        start, end = self.edge_sources[position.edge_id], self.edge_targets[position.edge_id]
+        sources = {end: (1 - position.offset) * edge_costs[position.edge_id]}
+        back = self.edges.get((end, start))
+        if back is not None:
+            sources[start] = position.offset * edge_costs[self.edge_index[back]]
+        return sources
+
+    def _leg_from(self, position: EdgePosition, edge_ids: List[int], end_id: int) -> List[Any]:
+        """多起点搜索结果前面补上当前路段（正向或掉头）"""
+        root = self.edge_sources[edge_ids[0]] if edge_ids else end_id
+        edge = self.edge_list[position.edge_id]
+        if root != self.edge_targets[position.edge_id]:
+            edge = self.edges[(self.edge_targets[position.edge_id], root)]
+        return [edge] + [self.edge_list[edge_id] for edge_id in edge_ids]
+
+    def _transit_leg(self, position: EdgePosition, end_id: int, weight: str = DEFAULT_PROFILE) -> Optional[List[Any]]:
+        """从路段中间出发的跨侧请求：两个起点各查一次过境节点表取较近者；有起点和终点同侧时返回None"""
+        best = None
+        for node, head in self.edge_position_sources(position, weight).items():
+            transit = self.transit_edge_ids(node, end_id, weight)
+            if transit is None:
+                return None
+            if head + transit[0] < INF and (best is None or head + transit[0] < best[0]):
+                best = (head + transit[0], transit[1])
+        return self._leg_from(position, best[1], end_id) if best else []
+
+    def start_offset(self, origin: Any, path: List[Any]) -> float:
+        """从origin出发沿path走时，第一段路已经走过的比例"""
+        if not isinstance(origin, EdgePosition) or not path:
+            return 0.0
+        if path[0] is self.edge_list[origin.edge_id]:
+            return origin.offset
+        return 1 - origin.offset
+
+    def route(self, start: Any, end: Any, method: Optional[str] = None, profile: str = DEFAULT_PROFILE) -> List[Any]:
+        """起点和终点都是建筑时直接查表，否则实时搜索；返回的列表可以被调用方修改
+
+        start也可以是EdgePosition，此时返回的第一段是当前所在的路段或它的反向。
+        """
+        if isinstance(start, EdgePosition):
+            return self.route_many([(start, end)], profile)[0]
+        table = self.route_tables.get(profile)
+        if table is not None:
+            start_name = self.building_names.get(self.node_id(start))
+            end_name = self.building_names.get(self.node_id(end))
+            if start_name is not None and end_name is not None:
+                route = table.get((start_name, end_name))
+                return list(route.edges) if route else []
+        if method is None and start in self and end in self:
+            transit = self.transit_edge_ids(self.node_id(start), self.node_id(end), profile)
+            if transit is not None:
+                return [self.edge_list[edge_id] for edge_id in transit[1]]
+        return self.find_shortest_path(start, end, method or self.default_method, profile)
+
+    def route_many(self, requests: Iterable[Tuple[Any, Any]], profile: str = DEFAULT_PROFILE, alternatives: int = 1, method: Optional[str] = None) -> List[List[Any]]:
+        """批量寻路：建筑之间的请求查表，其余请求用method（默认为default_method）搜索
+
+        配置了过境节点时，跨越分隔边的请求（包括从路段中间出发的）直接查过境节点表。
+        其余请求按起点分组，每个不同起点只搜索一次（见 _routes_from）。
+        alternatives大于1时，建筑之间的请求在前alternatives条相近路线中轮流分配。
+        起点可以是EdgePosition（走在路段中间），从该路段两端同时出发搜索。
+        返回的路线和requests一一对应，每条都是新列表，调用方可以随意修改。
+        """
+        requests = list(requests)
+        method = method or self.default_method
+        results: List[List[Any]] = [[] for _ in requests]
+        table = self.route_tables.get(profile)
+        # 起点编号 -> [(请求下标, 终点编号)]
+        groups: Dict[int, List[Tuple[int, int]]] = {}
+        # 路段中间的起点 -> [(请求下标, 终点编号)]
+        mid_edge: Dict[EdgePosition, List[Tuple[int, int]]] = {}
+        for index, (start, end) in enumerate(requests):
+            if isinstance(start, EdgePosition):
+                end_id = self.node_id(end)
+                if end_id is not None and self.connected(self.edge_sources[start.edge_id], end_id):
+                    transit = self._transit_leg(start, end_id, profile)
+                    if transit is not None:
+                        results[index] = transit
+                    else:
+                        mid_edge.setdefault(start, []).append((index, end_id))
+                continue
+            start_id, end_id = self.node_id(start), self.node_id(end)
+            if start_id is None or end_id is None or start_id == end_id or not self.connected(start_id, end_id):
+                continue
+            if table is not None:
+                start_name = self.building_names.get(start_id)
+                end_name = self.building_names.get(end_id)
+                if start_name is not None and end_name is not None:
+                    if alternatives > 1:
+                        route = self.choose_alternative(start_name, end_name, alternatives, profile)
+                    else:
+                        route = table.get((start_name, end_name))
+                    results[index] = list(route.edges) if route else []
+                    continue
+            transit = self.transit_edge_ids(start_id, end_id, profile)
+            if transit is not None:
+                results[index] = [self.edge_list[edge_id] for edge_id in transit[1]]
+                continue
+            groups.setdefault(start_id, []).append((index, end_id))
+        for start_id, wanted in groups.items():
+            found = self._routes_from(start_id, {end_id for _, end_id in wanted}, method, profile)
+            for index, end_id in wanted:
+                results[index] = list(found[end_id])
+        for position, wanted in mid_edge.items():
+            sources = self.edge_position_sources(position, profile)
+            tree = ShortestPathTree(self, -1, *self.multi_source_dijkstra(sources, weight=profile, stop_at={end_id for _, end_id in wanted}))
+            for index, end_id in wanted:
+                if tree.settled[end_id]:
+                    results[index] = self._leg_from(position, tree.edge_ids_to(end_id), end_id)
+        return results
+
+    def _routes_from(self, start_id: int, end_ids: Set[int], method: str, profile: str = DEFAULT_PROFILE) -> Dict[int, List[Any]]:
+        """从同一起点到多个终点的路线，每个起点只搜索一次
+
+        'compiled' 在精简图上做一次单源搜索，端点被收进超级边的终点改用原图；
+        只有一个终点时交给method对应的点对点方式（例如 'ch'）；
+        其余情况（'dijkstra'，或点对点方式遇到多个终点）在原图上做一次单源搜索。
+        """
+        found: Dict[int, List[Any]] = {}
+        if method == 'compiled':
+            compiled = self.compiled or self.compile_graph()
+            result = compiled.shortest_edge_ids_many(start_id, end_ids, profile) or {}
+            for end_id, (_, edge_ids) in result.items():
+                found[end_id] = [self.edge_list[edge_id] for edge_id in edge_ids]
+        elif method != 'dijkstra' and len(end_ids) == 1:
+            end_id = next(iter(end_ids))
+            found[end_id] = self.find_shortest_path(self.node_points[start_id], self.node_points[end_id], method, profile)
+        rest = end_ids.difference(found)
+        if rest:
+            tree = ShortestPathTree(self, start_id, *self.dijkstra(start_id, weight=profile, stop_at=rest))
+            for end_id in rest:
+                found[end_id] = [self.edge_list[edge_id] for edge_id in tree.edge_ids_to(end_id)]
+        return found
+
+    def edge_ids_between(self, start: Any, end: Any) -> List[int]:
+        """两点之间两个方向上的所有边编号，包括重复录入的平行路径"""
+        a, b = self.node_id(start), self.node_id(end)
+        if a is None or b is None:
+            return []
+        return [
+            self.csr_edge_ids[k] for node, other in ((a, b), (b, a))
+            for k in range(self.offsets[node], self.offsets[node + 1]) if self.targets[k] == other
+        ]
+
+    def _cached_profiles(self) -> Set[str]:
+        """已经有缓存（代价数组、路线表等）的偏好，边代价变化时只需修补这些"""
+        profiles = {weight for weight, _ in self._cost_arrays}
+        profiles.update(self.route_tables, self.alternative_tables, self.contraction_hierarchies, self.transit_routers)
+        return profiles
+
+    def _change_edges(self, edge_ids: Iterable[int], change: Callable[[], None], profiles: Iterable[str]) -> Set[int]:
+        """执行change修改边代价，然后逐个偏好增量修补缓存；返回代价真正变化了的边编号"""
+        edge_ids = list(edge_ids)
+        profiles = list(profiles)
+        before = {profile: {edge_id: self.current_cost(edge_id, profile) for edge_id in edge_ids} for profile in profiles}
+        change()
+        changed: Set[int] = set()
+        for profile in profiles:
+            old_costs = {edge_id: cost for edge_id, cost in before[profile].items() if cost != self.current_cost(edge_id, profile)}
+            if old_costs:
+                self._repair(profile, old_costs)
+                changed.update(old_costs)
+        return changed
+
+    def close_edges(self, edge_ids: Iterable[int]) -> Set[int]:
+        """封闭若干条边，返回受影响的边编号"""
+        edge_ids = set(edge_ids)
+        self._components = None
+        return self._change_edges(edge_ids, lambda: self.closed_edges.update(edge_ids), self._cached_profiles())
+
+    def reopen_edges(self, edge_ids: Iterable[int]) -> Set[int]:
+        """重新开放若干条边，返回受影响的边编号"""
+        edge_ids = set(edge_ids)
+        changed = self._change_edges(edge_ids, lambda: self.closed_edges.difference_update(edge_ids), self._cached_profiles())
+        if self._components is not None:
+            # 重新开放只会合并分量，直接在并查集上合并即可
+            for edge_id in edge_ids:
+                self._components.union(self.edge_sources[edge_id], self.edge_targets[edge_id])
+        return changed
+
+    def set_edge_cost(self, edge_ids: Iterable[int], cost: float, profile: str = DEFAULT_PROFILE) -> Set[int]:
+        """修改若干条边在某种偏好下的代价，返回受影响的边编号"""
+        edge_ids = list(edge_ids)
+        edge_costs = self.edge_costs(profile)
+
+        def change():
+            for edge_id in edge_ids:
+                edge_costs[edge_id] = cost
+
+        return self._change_edges(edge_ids, change, [profile])
+
+    def close_path(self, start: Any, end: Any) -> Set[int]:
+        """封闭两点之间的路（两个方向）"""
+        return self.close_edges(self.edge_ids_between(start, end))
+
+    def reopen_path(self, start: Any, end: Any) -> Set[int]:
+        """重新开放两点之间的路（两个方向）"""
+        return self.reopen_edges(self.edge_ids_between(start, end))
+
+    def _repair(self, profile: str, old_costs: Dict[int, float]):
+        """边代价变化后修补profile的各项缓存，而不是全部重算
+
+        代价只增不减时地标下界和启发系数仍然有效；路线表只重算经过这些边的路线，
+        代价变小时只重算能借这条边变短的路线。
+        """
+        increased = {edge_id for edge_id, cost in old_costs.items() if self.current_cost(edge_id, profile) > cost}
+        decreased = [edge_id for edge_id in old_costs if edge_id not in increased]
+        for reverse, positions in ((False, self.csr_positions), (True, self.reverse_csr_positions)):
+            costs = self._cost_arrays.get((profile, reverse))
+            if costs is not None:
+                for edge_id in old_costs:
+                    costs[positions[edge_id]] = self.current_cost(edge_id, profile)
+        if decreased:
+            self._heuristic_scales.pop(profile, None)
+            self.landmark_tables.pop(profile, None)
+        self.contraction_hierarchies.pop(profile, None)
+        self.transit_routers.pop(profile, None)
+        if self.compiled is not None:
+            self.compiled.invalidate(profile)
+
+        alternatives = self.alternative_tables.get(profile)
+        if alternatives:
+            if decreased:
+                alternatives.clear()
+            else:
+                for key in [key for key, routes in alternatives.items() if any(increased.intersection(route.edge_ids) for route in routes)]:
+                    del alternatives[key]
+
+        table = self.route_tables.get(profile)
+        if table is None:
+            return
+        stale = {key for key, route in table.items() if increased.intersection(route.edge_ids)}
+        for edge_id in decreased:
+            # 经过这条边的最短代价为 d(a, u) + c + d(v, b)，比现有路线短的才需要重算
+            to_start = self.dijkstra(self.edge_sources[edge_id], weight=profile, reverse=True)[0]
+            from_end = self.dijkstra(self.edge_targets[edge_id], weight=profile)[0]
+            cost = self.current_cost(edge_id, profile)
+            for start_name, a in self.building_nodes.items():
+                if to_start[a] == INF:
+                    continue
+                for end_name, b in self.building_nodes.items():
+                    if a == b:
+                        continue
+                    route = table.get((start_name, end_name))
+                    if to_start[a] + cost + from_end[b] < (route.cost if route else INF):
+                        stale.add((start_name, end_name))
+
+        by_origin: Dict[str, List[str]] = {}
+        for start_name, end_name in stale:
+            by_origin.setdefault(start_name, []).append(end_name)
+        for start_name, end_names in by_origin.items():
+            source = self.building_nodes[start_name]
+            targets = {self.building_nodes[end_name] for end_name in end_names}
+            tree = ShortestPathTree(self, source, *self.dijkstra(source, weight=profile, stop_at=targets))
+            for end_name in end_names:
+                edge_ids = tree.edge_ids_to(self.building_nodes[end_name])
+                if edge_ids:
+                    table[(start_name, end_name)] = self._make_route(edge_ids, tree.distances[self.building_nodes[end_name]])
+                else:
+                    table.pop((start_name, end_name), None)
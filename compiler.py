@@ -0,0 +1,170 @@
+import heapq
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from profiles import DEFAULT_PROFILE
+
+INF = math.inf
+
+
+class CompiledGraph:
+    """编译后的精简路网：合并平行边，把度为2的路口串成的链收成一条超级边
+
+    只保留路口（相邻节点数不为2的节点）和keep里的节点（通常是建筑）。
+    每条超级边记录它依次经过的步骤，每一步是同一对节点之间的所有平行边编号，
+    查询时按偏好取每一步代价最小的那条，展开后就是原来的路径，可以直接用于动画。
+    """
+
+    def __init__(self, graph: Any, keep: Iterable[int] = ()):
+        self.graph = graph
+        count = graph.node_count
+        # 每一步：(起点编号, 终点编号) -> 平行边编号
+        self.parallel: Dict[Tuple[int, int], List[int]] = {}
+        for edge_id in range(len(graph.edge_list)):
+            self.parallel.setdefault((graph.edge_sources[edge_id], graph.edge_targets[edge_id]), []).append(edge_id)
+        outgoing: List[Set[int]] = [set() for _ in range(count)]
+        for u, v in self.parallel:
+            outgoing[u].add(v)
+
+        kept = set(keep)
+        for node in range(count):
+            neighbors = outgoing[node]
+            # 只有两个方向都能走的两个邻居时才是链上的中间点
+            if len(neighbors) != 2 or any(node not in outgoing[neighbor] for neighbor in neighbors):
+                kept.add(node)
+
+        # 超级边：起点、终点和经过的步骤
+        self.arc_sources: List[int] = []
+        self.arc_targets: List[int] = []
+        self.arc_steps: List[Tuple[Tuple[int, int], ...]] = []
+        visited = bytearray(count)
+        for node in sorted(kept):
+            self._walk_from(node, outgoing, kept, visited)
+        # 全部由度为2的节点组成的环：随便保留一个点把它切开
+        for node in range(count):
+            if not visited[node] and node not in kept and outgoing[node]:
+                kept.add(node)
+                self._walk_from(node, outgoing, kept, visited)
+
+        self.nodes = sorted(kept)  # 精简后的编号 -> 原编号
+        self.node_of = array('l', [-1]) * count  # 原编号 -> 精简后的编号，被收掉的为-1
+        for compact, node in enumerate(self.nodes):
+            self.node_of[node] = compact
+        self.offsets, self.targets, self.arc_ids = graph._compress(
+            array('l', (self.node_of[u] for u in self.arc_sources)),
+            array('l', (self.node_of[v] for v in self.arc_targets)),
+            len(self.nodes)
+        )
+        # 与CSR位置对齐的超级边代价：权重名 -> array
+        self._costs: Dict[str, array] = {}
+
+    def _walk_from(self, start: int, outgoing: List[Set[int]], kept: Set[int], visited: bytearray):
+        """从保留节点start沿每个邻居走到下一个保留节点，生成超级边"""
+        visited[start] = 1
+        for first in outgoing[start]:
+            steps = [(start, first)]
+            previous, node = start, first
+            while node not in kept:
+                visited[node] = 1
+                following = next(iter(outgoing[node] - {previous}))
+                steps.append((node, following))
+                previous, node = node, following
+            if node == start:
+                continue
+            self.arc_sources.append(start)
+            self.arc_targets.append(node)
+            self.arc_steps.append(tuple(steps))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def arc_count(self) -> int:
+        return len(self.arc_steps)
+
+    def _best_edge(self, step: Tuple[int, int], weight: str) -> Tuple[float, int]:
+        """一步之内代价最小的平行边 (代价, 边编号)"""
+        return min((self.graph.current_cost(edge_id, weight), edge_id) for edge_id in self.parallel[step])
+
+    def costs(self, weight: str = DEFAULT_PROFILE) -> array:
+        """与CSR位置对齐的超级边代价，每一步取平行边中最小的代价"""
+        if weight not in self._costs:
+            arc_costs = [sum(self._best_edge(step, weight)[0] for step in steps) for steps in self.arc_steps]
+            self._costs[weight] = array('d', (arc_costs[arc] for arc in self.arc_ids))
+        return self._costs[weight]
+
+    def invalidate(self, weight: Optional[str] = None):
+        """边代价或封闭状态变化后丢掉代价缓存；weight为None时全部丢掉"""
+        if weight is None:
+            self._costs.clear()
+        else:
+            self._costs.pop(weight, None)
+
+    def expand(self, arc: int, weight: str = DEFAULT_PROFILE) -> List[int]:
+        """把超级边展开成原始边编号"""
+        return [self._best_edge(step, weight)[1] for step in self.arc_steps[arc]]
+
+    def geometry(self, arc: int) -> List[Any]:
+        """超级边经过的坐标点，画图或动画用"""
+        points = self.graph.node_points
+        steps = self.arc_steps[arc]
+        return [points[steps[0][0]]] + [points[v] for _, v in steps]
+
+    def shortest_edge_ids(self, source: int, target: int, weight: str = DEFAULT_PROFILE) -> Optional[Tuple[float, List[int]]]:
+        """在精简图上查询原编号source到target的最短路线 (代价, 原始边编号)
+
+        两端有一端被收进了超级边时返回None，调用方应改用原图搜索；不可达时返回 (inf, [])。
+        """
+        if self.node_of[target] < 0:
+            return None
+        result = self.shortest_edge_ids_many(source, [target], weight)
+        return None if result is None else result[target]
+
+    def shortest_edge_ids_many(self, source: int, targets: Iterable[int], weight: str = DEFAULT_PROFILE) -> Optional[Dict[int, Tuple[float, List[int]]]]:
+        """从source出发只搜索一次，得到到多个终点的最短路线 {终点原编号: (代价, 原始边编号)}
+
+        source被收进了超级边时返回None；被收掉的终点不在结果里，调用方应改用原图搜索；不可达的为 (inf, [])。
+        """
+        start = self.node_of[source]
+        if start < 0:
+            return None
+        ends = {self.node_of[target]: target for target in targets if self.node_of[target] >= 0}
+        costs = self.costs(weight)
+        distances = {start: 0.0}
+        parents: Dict[int, int] = {}
+        remaining = set(ends)
+        queue = [(0.0, start)]
+        while queue and remaining:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            remaining.discard(node)
+            for k in range(self.offsets[node], self.offsets[node + 1]):
+                neighbor = self.targets[k]
+                candidate = distance + costs[k]
+                if candidate < distances.get(neighbor, INF):
+                    distances[neighbor] = candidate
+                    parents[neighbor] = self.arc_ids[k]
+                    heapq.heappush(queue, (candidate, neighbor))
+        results: Dict[int, Tuple[float, List[int]]] = {}
+        for end, target in ends.items():
+            if distances.get(end, INF) == INF:
+                results[target] = (INF, [])
+                continue
+            arcs = []
+            node = end
+            while node != start:
+                arc = parents[node]
+                arcs.append(arc)
+                node = self.node_of[self.arc_sources[arc]]
+            edge_ids: List[int] = []
+            for arc in reversed(arcs):
+                edge_ids.extend(self.expand(arc, weight))
+            results[target] = (distances[end], edge_ids)
+        return results
+
+    def report(self) -> str:
+        """编译前后的规模对比"""
+        return f"路网编译：节点 {self.graph.node_count} -> {self.node_count}，有向边 {len(self.graph.edge_list)} -> {self.arc_count}"
@@ -0,0 +1,31 @@
+from array import array
+
+
+class UnionFind:
+    """并查集：按大小合并，查询时路径减半，合并和查询都接近O(1)"""
+
+    def __init__(self, count: int):
+        self.parent = array('l', range(count))
+        self.size = array('l', [1]) * count
+
+    def find(self, node: int) -> int:
+        """node所在集合的代表元"""
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a: int, b: int) -> bool:
+        """合并a和b所在的集合，原本就在同一集合时返回False"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+    def connected(self, a: int, b: int) -> bool:
+        return self.find(a) == self.find(b)
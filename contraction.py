@@ -0,0 +1,222 @@
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from profiles import DEFAULT_PROFILE
+
+# 见证搜索最多确定的节点数，超过后直接加捷径（结果仍然正确，只是捷径多一些）
+WITNESS_SETTLE_LIMIT = 200
+# 估算收缩优先级时见证搜索最多确定的节点数；只影响收缩顺序，真正收缩时用上面的上限
+PRIORITY_SETTLE_LIMIT = 30
+
+
+class ContractionHierarchy:
+    """收缩层次路由：预处理时按重要性逐个收缩节点并添加捷径，查询时只做向上的双向搜索
+
+    构建代价远高于一次查询，而且随节点数超线性增长（实测网格路网1600个节点约2秒、
+    4900个节点约8秒），只适合路网不变、查询很多的场合。CampusGraph._repair 在边代价
+    变化（封路、拥堵）时会直接丢掉对应偏好的收缩层次，下一次查询要付出完整的重建代价；
+    路网经常变化时应改用ALT或编译路网。
+    """
+
+    def __init__(self, graph: Any, weight: str = DEFAULT_PROFILE):
+        self.weight = weight
+        self.graph = graph
+        count = graph.node_count
+        # 所有弧（原始边和捷径）：(u, v) -> (代价, 中间节点)，原始边的中间节点为None
+        self.arcs: Dict[Tuple[int, int], Tuple[float, Optional[int]]] = {}
+        # 原始弧对应的边编号
+        self.original: Dict[Tuple[int, int], int] = {}
+        outgoing: List[Dict[int, float]] = [{} for _ in range(count)]
+        incoming: List[Dict[int, float]] = [{} for _ in range(count)]
+        offsets, targets, edge_ids, costs = graph.csr(weight)
+        for u in range(count):
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                cost = costs[k]
+                if u == v or ((u, v) in self.arcs and self.arcs[(u, v)][0] <= cost):
+                    continue
+                self.arcs[(u, v)] = (cost, None)
+                self.original[(u, v)] = edge_ids[k]
+                outgoing[u][v] = cost
+                incoming[v][u] = cost
+
+        self.rank = [0] * count
+        self._contract_all(outgoing, incoming)
+
+        # 查询只用到通向更高层节点的弧
+        self.upward: List[List[Tuple[int, float]]] = [[] for _ in range(count)]
+        self.downward: List[List[Tuple[int, float]]] = [[] for _ in range(count)]
+        for (u, v), (cost, _) in self.arcs.items():
+            if self.rank[v] > self.rank[u]:
+                self.upward[u].append((v, cost))
+            else:
+                self.downward[v].append((u, cost))
+
+    def _witness_distances(self, outgoing, source: int, excluded: int, targets: Dict[int, float], limit: float, settle_limit: int) -> Dict[int, float]:
+        """不经过被收缩节点的有限Dijkstra；所有目标都确定或距离超过limit后停止"""
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        remaining = len(targets)
+        settled = 0
+        while queue and settled < settle_limit:
+            distance, node = heapq.heappop(queue)
+            if distance > distances.get(node, math.inf):
+                continue
+            if distance > limit:
+                break
+            settled += 1
+            if node in targets:
+                remaining -= 1
+                if not remaining:
+                    break
+            for neighbor, cost in outgoing[node].items():
+                if neighbor == excluded:
+                    continue
+                candidate = distance + cost
+                if candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    heapq.heappush(queue, (candidate, neighbor))
+        return distances
+
+    def _shortcuts(self, outgoing, incoming, node: int, settle_limit: Optional[int] = None) -> List[Tuple[int, int, float]]:
+        """收缩node时需要添加的捷径"""
+        shortcuts = []
+        settle_limit = settle_limit or WITNESS_SETTLE_LIMIT
+        if not outgoing[node]:
+            return shortcuts
+        max_out = max(outgoing[node].values())
+        for source, cost_in in incoming[node].items():
+            targets = {target: cost_in + cost_out for target, cost_out in outgoing[node].items() if target != source}
+            if not targets:
+                continue
+            witness = self._witness_distances(outgoing, source, node, targets, cost_in + max_out, settle_limit)
+            for target, cost in targets.items():
+                if witness.get(target, math.inf) > cost:
+                    shortcuts.append((source, target, cost))
+        return shortcuts
+
+    def _priority(self, outgoing, incoming, node: int, contracted_neighbors: List[int], depth: List[int]) -> Tuple[int, List[Tuple[int, int, float]]]:
+        """收缩优先级（越小越先收缩）：边差值 + 已收缩的邻居数 + 所在层深度，后两项让收缩在图上分布均匀"""
+        shortcuts = self._shortcuts(outgoing, incoming, node, PRIORITY_SETTLE_LIMIT)
+        edge_difference = len(shortcuts) - len(outgoing[node]) - len(incoming[node])
+        return 2 * edge_difference + contracted_neighbors[node] + depth[node], shortcuts
+
+    def _contract_all(self, outgoing, incoming):
+        count = self.graph.node_count
+        contracted_neighbors = [0] * count
+        depth = [0] * count
+        queue = [(self._priority(outgoing, incoming, node, contracted_neighbors, depth)[0], node) for node in range(count)]
+        heapq.heapify(queue)
+        contracted = bytearray(count)
+        level = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if contracted[node]:
+                continue
+            # 惰性更新：邻居的优先级只在弹出时重算，变差就放回队列
+            priority, shortcuts = self._priority(outgoing, incoming, node, contracted_neighbors, depth)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))
+                continue
+            shortcuts = self._shortcuts(outgoing, incoming, node)
+            for source, target, cost in shortcuts:
+                if cost < outgoing[source].get(target, math.inf):
+                    outgoing[source][target] = cost
+                    incoming[target][source] = cost
+                    self.arcs[(source, target)] = (cost, node)
+            neighbors = set(outgoing[node]) | set(incoming[node])
+            for neighbor in outgoing[node]:
+                del incoming[neighbor][node]
+            for neighbor in incoming[node]:
+                del outgoing[neighbor][node]
+            for neighbor in neighbors:
+                contracted_neighbors[neighbor] += 1
+                depth[neighbor] = max(depth[neighbor], depth[node] + 1)
+            outgoing[node] = {}
+            incoming[node] = {}
+            contracted[node] = 1
+            self.rank[node] = level
+            level += 1
+
+    def _unpack(self, u: int, v: int, path: List[int]):
+        """把捷径递归展开成原始边编号"""
+        stack = [(u, v)]
+        while stack:
+            u, v = stack.pop()
+            middle = self.arcs[(u, v)][1]
+            if middle is None:
+                path.append(self.original[(u, v)])
+            else:
+                stack.append((middle, v))
+                stack.append((u, middle))
+
+    def _stalled(self, node: int, distance: float, distances: Dict[int, float], arcs_from_above: List[Tuple[int, float]]) -> bool:
+        """按需停滞：能从更高层的已到达节点以更短距离走到node时，node不可能在最短路上，不用再往上扩展"""
+        for higher, cost in arcs_from_above:
+            if distances.get(higher, math.inf) + cost < distance:
+                return True
+        return False
+
+    def query_edge_ids(self, source: int, target: int) -> Tuple[float, List[int]]:
+        """按节点编号查询，返回 (最短距离, 边编号列表)，不可达时返回 (inf, [])
+
+        正反两个方向交替做向上搜索，某个方向队首的距离不小于已知最短距离时这个方向就停止；
+        每个节点先做按需停滞检查，被更高层节点以更短距离到达的节点不再扩展。
+        """
+        if source == target:
+            return 0.0, []
+        # 正向沿upward走，停滞检查看从更高层指向它的弧（downward）；反向相反
+        graphs = (self.upward, self.downward)
+        stall_arcs = (self.downward, self.upward)
+        distances: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0.0}, {target: 0.0})
+        parents: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        queues = ([(0.0, source)], [(0.0, target)])
+        best = math.inf
+        meeting = None
+        while queues[0] or queues[1]:
+            # 取队首较小的方向；队首已经不小于best的方向不再搜索
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            distance, node = heapq.heappop(queues[side])
+            if distance >= best:
+                queues[side].clear()
+                continue
+            side_distances = distances[side]
+            if distance > side_distances[node]:
+                continue
+            other = distances[1 - side].get(node)
+            if other is not None and distance + other < best:
+                best = distance + other
+                meeting = node
+            if self._stalled(node, distance, side_distances, stall_arcs[side][node]):
+                continue
+            for neighbor, cost in graphs[side][node]:
+                candidate = distance + cost
+                if candidate < side_distances.get(neighbor, math.inf):
+                    side_distances[neighbor] = candidate
+                    parents[side][neighbor] = node
+                    heapq.heappush(queues[side], (candidate, neighbor))
+        if meeting is None:
+            return math.inf, []
+
+        forward_parents, backward_parents = parents
+        chain = [meeting]
+        while chain[-1] != source:
+            chain.append(forward_parents[chain[-1]])
+        chain.reverse()
+        node = meeting
+        while node != target:
+            node = backward_parents[node]
+            chain.append(node)
+        edge_ids: List[int] = []
+        for u, v in zip(chain, chain[1:]):
+            self._unpack(u, v, edge_ids)
+        return best, edge_ids
+
+    def query(self, start: Any, end: Any) -> Tuple[float, List[Any]]:
+        """返回 (最短距离, 路径列表)，不可达时返回 (inf, [])"""
+        source, target = self.graph.node_id(start), self.graph.node_id(end)
+        if source is None or target is None:
+            return math.inf, []
+        distance, edge_ids = self.query_edge_ids(source, target)
+        return distance, [self.graph.edge_list[edge_id] for edge_id in edge_ids]
@@ -0,0 +1,34 @@
+import heapq
+import itertools
+import math
+from typing import Any, List, Tuple
+
+# 事件类型
+ACTIVITY_START = 'activity_start'  # 活动开始，学生出发前往活动地点
+ACTIVITY_END = 'activity_end'  # 活动结束
+EDGE_ARRIVAL = 'edge_arrival'  # 走完一段路，到达路段终点
+STAY_END = 'stay_end'  # 在活动地点的停留结束
+
+
+class EventQueue:
+    """按时间排序的事件队列，同一时刻的事件按加入的先后处理"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, str, Any, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, time: float, kind: str, student: Any, data: Any = None):
+        """加入一个事件；data由事件类型决定（活动序号或行程编号）"""
+        heapq.heappush(self._heap, (time, next(self._counter), kind, student, data))
+
+    def pop(self) -> Tuple[float, str, Any, Any]:
+        """取出最早的事件 (时间, 类型, 学生, data)"""
+        time, _, kind, student, data = heapq.heappop(self._heap)
+        return time, kind, student, data
+
+    def next_time(self) -> float:
+        """最早事件的时间，队列为空时为inf"""
+        return self._heap[0][0] if self._heap else math.inf
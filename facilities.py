@@ -0,0 +1,91 @@
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from profiles import DEFAULT_PROFILE
+
+INF = math.inf
+
+# 设施类别 -> 属于该类别的建筑名
+FACILITY_CATEGORIES: Dict[str, List[str]] = {
+    'canteen': ['CanteenD5', 'CanteenF5', 'MD'],
+    'classroom': ['F3a', 'F3b', 'F3c', 'F3d'],
+    'library': ['Library'],
+}
+
+
+class FacilityIndex:
+    """最近设施查询：每个类别做一次多起点搜索，给每个节点标上离它最近的设施（路网上的Voronoi划分）
+
+    搜索在反向图上进行，得到的是从节点走到设施的代价。
+    建好之后任意节点的最近设施查询是O(1)；nearest_k需要每个设施各一张距离表，第一次用到时再算。
+    """
+
+    def __init__(self, graph: Any, buildings: Dict[str, Any], categories: Optional[Dict[str, Iterable[str]]] = None, weight: str = DEFAULT_PROFILE):
+        self.graph = graph
+        self.weight = weight
+        # 类别 -> [(设施名, 节点编号)]，不在路网上的建筑被忽略
+        self.facilities: Dict[str, List[Tuple[str, int]]] = {}
+        for category, names in (categories or FACILITY_CATEGORIES).items():
+            self.facilities[category] = [
+                (name, graph.node_id(buildings[name])) for name in names
+                if name in buildings and graph.node_id(buildings[name]) is not None
+            ]
+        # 类别 -> 每个节点最近设施在facilities[category]中的下标（-1表示到不了任何设施）
+        self.owners: Dict[str, array] = {}
+        # 类别 -> 每个节点到最近设施的代价
+        self.distances: Dict[str, array] = {}
+        # 设施名 -> 每个节点到该设施的代价
+        self._facility_distances: Dict[str, array] = {}
+        self.refresh()
+
+    def refresh(self):
+        """路网代价或封闭状态变化后重新划分"""
+        graph = self.graph
+        self._facility_distances = {}
+        for category, facilities in self.facilities.items():
+            sources = {node: 0.0 for _, node in facilities}
+            distances, predecessors, settled = graph.multi_source_dijkstra(sources, weight=self.weight, reverse=True)
+            owners = array('l', [-1]) * graph.node_count
+            for index, (_, node) in enumerate(facilities):
+                owners[node] = index
+            # 按距离从近到远，每个节点继承前驱（离设施更近一步的节点）的归属
+            for node in sorted((node for node in range(graph.node_count) if settled[node]), key=distances.__getitem__):
+                edge_id = predecessors[node]
+                if edge_id != -1:
+                    owners[node] = owners[graph.edge_targets[edge_id]]
+            self.owners[category] = owners
+            self.distances[category] = array('d', distances)
+
+    def nearest(self, category: str, point: Any) -> Optional[str]:
+        """离point最近的某类设施名，point不在路网上或到不了时返回None"""
+        node = self.graph.node_id(point)
+        if node is None or category not in self.owners:
+            return None
+        index = self.owners[category][node]
+        return self.facilities[category][index][0] if index >= 0 else None
+
+    def nearest_distance(self, category: str, point: Any) -> float:
+        """到最近一个该类设施的代价"""
+        node = self.graph.node_id(point)
+        if node is None or category not in self.distances:
+            return INF
+        return self.distances[category][node]
+
+    def nearest_k(self, category: str, point: Any, k: int) -> List[str]:
+        """按代价从近到远的前k个该类设施，到不了的不算；k为1时直接查划分结果"""
+        if k == 1:
+            nearest = self.nearest(category, point)
+            return [nearest] if nearest is not None else []
+        node = self.graph.node_id(point)
+        if node is None:
+            return []
+        ranked = []
+        for name, facility in self.facilities.get(category, []):
+            if name not in self._facility_distances:
+                self._facility_distances[name] = array('d', self.graph.dijkstra(facility, weight=self.weight, reverse=True)[0])
+            distance = self._facility_distances[name][node]
+            if distance != INF:
+                ranked.append((distance, name))
+        ranked.sort()
+        return [name for _, name in ranked[:k]]
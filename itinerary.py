@@ -0,0 +1,63 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Sequence, Tuple
+
+# segments中每段占的格数：(路段用时, 起始比例, 起点x, 起点y, 终点x, 终点y)
+SEGMENT_FIELDS = 6
+
+
+def smooth_step(t: float) -> float:
+    """平滑插值函数"""
+    return t * t * (3 - 2 * t)
+
+
+class Itinerary:
+    """学生一天的行程：按开始时间排好的若干段，每段是走一条路或停在某处
+
+    路线和出发时间确定后，每条路段的开始时刻就确定了，所以出发时把整条路线一次写进来；
+    中途改变去向时从改变的时刻截断再接上新路线。任意时刻的位置是一次二分查找加一次插值，
+    可以直接跳到一天中的任何时间，不用从早上逐秒重放。
+    """
+
+    __slots__ = ('times', 'segments')
+
+    def __init__(self, point: Any):
+        # 每段的开始时间，第一段是从-inf开始停在起点
+        self.times = array('d', [-math.inf])
+        self.segments = array('d', [0.0, 0.0, point.x, point.y, point.x, point.y])
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def truncate(self, time: float):
+        """丢掉time及以后开始的段，之后会从time接上新的行程"""
+        index = max(1, bisect_left(self.times, time))
+        del self.times[index:]
+        del self.segments[index * SEGMENT_FIELDS:]
+
+    def stop(self, time: float, point: Any):
+        """从time起停在point"""
+        self.times.append(time)
+        self.segments.extend((0.0, 0.0, point.x, point.y, point.x, point.y))
+
+    def follow(self, time: float, origin: Any, path: Sequence[Any], offset: float = 0.0) -> float:
+        """从time起沿path走（第一段已走过offset），走完后停在终点；path为空时停在origin。返回到达时间"""
+        self.truncate(time)
+        for edge in path:
+            self.times.append(time)
+            self.segments.extend((edge.time_cost, offset, edge.start.x, edge.start.y, edge.end.x, edge.end.y))
+            time += (1 - offset) * edge.time_cost
+            offset = 0.0
+        self.stop(time, path[-1].end if path else origin)
+        return time
+
+    def coordinates_at(self, time: float) -> Tuple[float, float]:
+        """time时刻的坐标：二分找到所在的段，再按平滑插值算出路段上的位置"""
+        index = bisect_right(self.times, time) - 1
+        base = max(index, 0) * SEGMENT_FIELDS
+        duration, offset, x0, y0, x1, y1 = self.segments[base:base + SEGMENT_FIELDS]
+        if duration == 0.0:
+            return x0, y0
+        progress = smooth_step(min(1.0, offset + (time - self.times[index]) / duration))
+        return x0 + (x1 - x0) * progress, y0 + (y1 - y0) * progress
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import math
+import os
+from array import array
+from typing import Any, Callable, List, Optional
+
+from profiles import DEFAULT_PROFILE
+
+INF = math.inf
+
+
+def map_version(graph: Any, weight: str = DEFAULT_PROFILE) -> str:
+    """根据每条有向边（包括平行边）的端点坐标和在weight下的代价生成地图版本号，地图或代价改动后版本号随之变化"""
+    xs, ys = graph.xs, graph.ys
+    records = sorted(
+        (xs[start], ys[start], xs[end], ys[end], cost)
+        for start, end, cost in zip(graph.edge_sources, graph.edge_targets, graph.edge_costs(weight))
+    )
+    return hashlib.md5(json.dumps([weight, records]).encode('utf-8')).hexdigest()
+
+
+def landmark_file(map_file: str, weight: str = DEFAULT_PROFILE) -> str:
+    """地标表保存在地图文件旁边，例如 data.json -> data.shortest.landmarks.json"""
+    root, _ = os.path.splitext(map_file)
+    return f"{root}.{weight}.landmarks.json"
+
+
+class LandmarkTable:
+    """ALT预处理结果：若干地标到每个节点（正向和反向）的最短距离，按节点编号存放"""
+
+    def __init__(self, weight: str, landmarks: List[int], distances_from: List[array], distances_to: List[array]):
+        self.weight = weight
+        self.landmarks = landmarks
+        self.distances_from = distances_from  # d(地标, 节点)
+        self.distances_to = distances_to  # d(节点, 地标)
+
+    @classmethod
+    def build(cls, graph: Any, count: int = 4, weight: str = DEFAULT_PROFILE) -> 'LandmarkTable':
+        """用最远点策略选取地标：每次选离已有地标最远的可达节点"""
+        landmarks: List[int] = []
+        distances_from: List[array] = []
+        distances_to: List[array] = []
+        if not graph.node_count:
+            return cls(weight, landmarks, distances_from, distances_to)
+
+        # 从任意节点出发找到最远的点作为第一个地标
+        seed = graph.dijkstra(0, -1, weight)[0]
+        reachable = [node for node, distance in enumerate(seed) if distance != INF]
+        candidate = max(reachable, key=seed.__getitem__)
+        closest = {node: INF for node in reachable}
+        for _ in range(min(count, len(reachable))):
+            landmarks.append(candidate)
+            forward = array('d', graph.dijkstra(candidate, -1, weight)[0])
+            distances_from.append(forward)
+            distances_to.append(array('d', graph.dijkstra(candidate, -1, weight, reverse=True)[0]))
+            for node in closest:
+                closest[node] = min(closest[node], forward[node])
+            candidate = max(closest, key=lambda node: closest[node] if closest[node] != INF else -1)
+            if closest[candidate] <= 0:
+                break
+        return cls(weight, landmarks, distances_from, distances_to)
+
+    def lower_bound(self, node: int, target: int) -> float:
+        """三角不等式给出的 d(node, target) 下界"""
+        return self.heuristic(target)(node)
+
+    def heuristic(self, target: int) -> Callable[[int], float]:
+        """固定终点的下界函数，供A*反复调用"""
+        pairs = [
+            (forward, forward[target], backward, backward[target])
+            for forward, backward in zip(self.distances_from, self.distances_to)
+        ]
+
+        def bound(node: int) -> float:
+            best = 0.0
+            for forward, to_target, backward, from_target in pairs:
+                # 两边都不可达时差值为nan，比较结果为False，自动被忽略
+                value = to_target - forward[node]
+                if value > best:
+                    best = value
+                value = backward[node] - from_target
+                if value > best:
+                    best = value
+            return best
+
+        return bound
+
+    def save(self, file_name: str, graph: Any, version: str) -> bool:
+        """把地标表写成JSON，节点顺序用坐标记录，不可达写成null；目录不可写时不保存，返回False"""
+        def to_list(table):
+            return [None if d == INF else d for d in table]
+
+        data = {
+            'version': version,
+            'weight': self.weight,
+            'nodes': [[point.x, point.y] for point in graph.node_points],
+            'landmarks': self.landmarks,
+            'distances_from': [to_list(table) for table in self.distances_from],
+            'distances_to': [to_list(table) for table in self.distances_to],
+        }
+        try:
+            with open(file_name, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError:
+            return False
+        return True
+
+    @classmethod
+    def load(cls, file_name: str, graph: Any, version: str, weight: str = DEFAULT_PROFILE) -> Optional['LandmarkTable']:
+        """读取地标表；文件不存在或地图版本不一致时返回None"""
+        try:
+            with open(file_name, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get('version') != version or data.get('weight') != weight:
+            return None
+        # 文件里的节点顺序可能和当前编号不同，按坐标重新对应
+        ids = [graph.node_ids.get((x, y)) for x, y in data['nodes']]
+        if None in ids or len(ids) != graph.node_count:
+            return None
+
+        def to_table(values):
+            table = array('d', [INF]) * graph.node_count
+            for node, d in zip(ids, values):
+                if d is not None:
+                    table[node] = d
+            return table
+
+        return cls(
+            weight,
+            [ids[landmark] for landmark in data['landmarks']],
+            [to_table(values) for values in data['distances_from']],
+            [to_table(values) for values in data['distances_to']],
+        )
@@ -3,7 +3,7 @@ import json
 import time
 from dataclasses import dataclass
 from typing import Tuple, List, Dict, Optional
-import heapq
+from campus_graph import CampusGraph
 
 # 常量配置
 SCREEN_WIDTH = 800
@@ -26,6 +26,9 @@ VIRTUAL_START_HOUR = 7
 VIRTUAL_START_MINUTE = 0
 VIRTUAL_START_SECOND = 0
 
+# 手工描点的坐标误差，距离小于它的点合并为同一个路口（0.005约5m）
+SNAP_TOLERANCE = 0.005
+
 
 @dataclass(frozen=True, order=True)
 class Point:
@@ -48,13 +51,19 @@ class GameConfig:
 
 
 class Path:
-    def __init__(self, path_id: int, start: Point, end: Point, length: float, time_cost: float, is_forward: bool = True):
+    def __init__(self, path_id: int, start: Point, end: Point, length: float, time_cost: float, is_forward: bool = True, difficulty: float = 1.0, capacity: float = 100):
         self.id = path_id
         self.start = start
         self.end = end
         self.length = length
         self.time_cost = time_cost
         self.is_forward = is_forward
+        self.difficulty = difficulty
+        self.capacity = capacity
+
+    def reverse(self) -> 'Path':
+        """生成反方向的路径"""
+        return Path(self.id, self.end, self.start, self.length, self.time_cost, is_forward=not self.is_forward, difficulty=self.difficulty, capacity=self.capacity)
 
     def draw(self, config: GameConfig):
         """绘制路径"""
@@ -131,6 +140,7 @@ class Game:
         self.paths: List[Path] = []
         self.students: List[Student] = []
         self.buildings: Dict[str, Point] = {}
+        self.graph: Optional[CampusGraph] = None
         self.font = pygame.font.Font(None, 36)  # 添加字体
         self.virtual_time = time.mktime((2023, 10, 1, VIRTUAL_START_HOUR, VIRTUAL_START_MINUTE, VIRTUAL_START_SECOND, 0, 0, 0))
         self.load_data()
@@ -148,8 +158,18 @@ class Game:
                     end = Point(path_data['end_point'][0], path_data['end_point'][1])
                     self.paths.append(Path(
                         path_data['id'], start, end,
-                        path_data['length'], path_data['time_cost']
+                        path_data['length'], path_data['time_cost'],
+                        difficulty=path_data.get('difficulty', 1.0),
+                        capacity=path_data.get('capacity', 100)
                     ))
+                self.graph = CampusGraph(self.paths, SNAP_TOLERANCE)  # 路网只构建一次
+                if self.graph.merges or self.graph.dropped_paths:
+                    print(self.graph.merge_report())
+                self.graph.build_route_table(self.buildings)  # 建筑之间的路线预先算好
+                print(self.graph.use_compiled_graph().report())  # 合并重复录入的路段，其余查询在精简路网上搜索
+                if self.graph.isolated_buildings():
+                    print(self.graph.connectivity_report())
+                self.graph.landmark_map_file = 'data.json'  # 用到ALT时地标表按地图版本缓存在data.json旁边
                 for student_data in data.get('students', []):
                     schedule = self.get_schedule_for_class(student_data['class_name'], data['class'], data['subjects'])
                     student = Student(
@@ -182,34 +202,8 @@ class Game:
         return []
 
     def find_shortest_path(self, start: Point, end: Point) -> List[Path]:
-        if start == end:
-            return []
-
-        graph = {point: [] for path in self.paths for point in [path.start, path.end]}
-        for path in self.paths:
-            # 优先添加正向路径
-            graph[path.start].append((path.end, path))
-            # 只有正向路径不存在时才添加反向路径（可根据实际情况调整添加反向路径的条件）
-            if not any(p[1].start == path.end and p[1].is_forward for p in graph[path.end]):
-                graph[path.end].append((path.start, Path(path.id, path.end, path.start, path.length, path.time_cost, is_forward=False)))
-
-        distances = {start: 0}
-        queue = [(0, id(start), start, [])]  # 使用id()来区分相同坐标的点
-        visited = set()
-        while queue:
-            current_distance, _, current_node, path = heapq.heappop(queue)
-            if current_node in visited:
-                continue
-            visited.add(current_node)
-            if current_node == end:
-                return path
-            for neighbor, edge in graph[current_node]:
-                if neighbor not in visited:
-                    distance = current_distance + edge.length
-                    if neighbor not in distances or distance < distances[neighbor]:
-                        distances[neighbor] = distance
-                        heapq.heappush(queue, (distance, id(neighbor), neighbor, path + [edge]))
-        return []
+        """在预先构建好的校园路网上查找最短路径"""
+        return self.graph.route(start, end)
 
     def handle_events(self):
         """处理事件"""
@@ -6,6 +6,9 @@ from typing import Tuple, List, Dict, Optional
 import heapq
 import random
 
+from campus_graph import CampusGraph
+from facilities import FacilityIndex
+
 # 常量配置
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 700
@@ -27,6 +30,9 @@ VIRTUAL_START_HOUR = 21  # 学生晚上9:30
 VIRTUAL_START_MINUTE = 30
 VIRTUAL_START_SECOND = 0
 
+# 吃饭时在离当前位置最近的几个食堂中随机选一个，1表示总是去最近的
+MEAL_NEAREST_K = 1
+
 
 @dataclass(frozen=True, order=True)
 class Point:
@@ -57,6 +63,10 @@ class Path:
         self.time_cost = time_cost
         self.is_forward = is_forward
 
+    def reverse(self) -> 'Path':
+        """生成反方向的路径"""
+        return Path(self.id, self.end, self.start, self.length, self.time_cost, is_forward=not self.is_forward)
+
     def draw(self, config: GameConfig):
         """绘制路径"""
         start_pos = self.start.to_screen_coords(config.bg_width, config.bg_height)
@@ -65,12 +75,13 @@ class Path:
 
 
 class Student:
-    def __init__(self, student_id: int, name: str, class_name: str, dormitory: str, buildings: Dict[str, Point]):
+    def __init__(self, student_id: int, name: str, class_name: str, dormitory: str, buildings: Dict[str, Point], facilities: FacilityIndex):
         self.id = student_id
         self.name = name
         self.class_name = class_name
         self.dormitory = dormitory
         self.buildings = buildings
+        self.facilities = facilities
         self.position: Optional[Point] = buildings[dormitory]  # 初始化位置为宿舍
         self.schedule: List[Tuple[int, int, str, int]] = []  # (小时, 分钟, 地点, 花费时间)
         self.current_schedule_index: int = 0
@@ -78,17 +89,24 @@ class Student:
         self.move_start_time: Optional[float] = None
         self.generate_schedule()  # 生成日程
 
+    def nearest_canteen(self, building: str) -> str:
+        """离building最近的食堂（MEAL_NEAREST_K大于1时在最近的几个里随机选）"""
+        choices = self.facilities.nearest_k('canteen', self.buildings[building], MEAL_NEAREST_K)
+        return random.choice(choices or ["CanteenD5", "CanteenF5", "MD"])
+
     def generate_schedule(self):
-        # 生成日程安排
+        # 生成日程安排，吃饭去离上一个地点最近的食堂
+        second_class = random.choice(["F3a", "F3b", "F3c", "F3d"])
+        fourth_class = random.choice(["F3a", "F3b", "F3c", "F3d"])
         self.schedule = [
-            (7, 0, random.choice(["CanteenD5", "CanteenF5", "MD"]), 20),  # 早餐
+            (7, 0, self.nearest_canteen(self.dormitory), 20),  # 早餐
             (8, 0, random.choice(["F3a", "F3b", "F3c", "F3d"]), 100),  # 第一节课
-            (10, 0, random.choice(["F3a", "F3b", "F3c", "F3d"]), 60),  # 第二节课
-            (11, 40, random.choice(["CanteenD5", "CanteenF5", "MD"]), 20),  # 午餐
+            (10, 0, second_class, 60),  # 第二节课
+            (11, 40, self.nearest_canteen(second_class), 20),  # 午餐
             (12, 0, self.dormitory, 30),  # 回宿舍
             (14, 0, random.choice(["F3a", "F3b", "F3c", "F3d"]), 100),  # 第三节课
-            (16, 0, random.choice(["F3a", "F3b", "F3c", "F3d"]), 100),  # 第四节课
-            (18, 0, random.choice(["CanteenD5", "CanteenF5", "MD"]), 20),  # 晚餐
+            (16, 0, fourth_class, 100),  # 第四节课
+            (18, 0, self.nearest_canteen(fourth_class), 20),  # 晚餐
             (20, 30, self.dormitory, 30),  # 返回宿舍
         ]
 
@@ -164,6 +182,8 @@ class Game:
         self.paths: List[Path] = []
         self.students: List[Student] = []
         self.buildings: Dict[str, Point] = {}
+        self.graph: Optional[CampusGraph] = None
+        self.facilities: Optional[FacilityIndex] = None
         self.font = pygame.font.Font(None, 36)
         self.virtual_time = (VIRTUAL_START_HOUR * 3600 + VIRTUAL_START_MINUTE * 60 + VIRTUAL_START_SECOND)
         self.load_data()
@@ -183,13 +203,16 @@ class Game:
                         path_data['id'], start, end,
                         path_data['length'], path_data['time_cost']
                     ))
+                self.graph = CampusGraph(self.paths)
+                self.facilities = FacilityIndex(self.graph, self.buildings)  # 每个路口离哪个食堂、教室、图书馆最近
                 for student_data in data.get('students', []):
                     student = Student(
                         student_data['id'],
                         student_data['name'],
                         student_data['class_name'],
                         student_data['dormitory'],
-                        self.buildings
+                        self.buildings,
+                        self.facilities
                     )
                     self.students.append(student)
 
@@ -0,0 +1,15 @@
+from operator import attrgetter
+from typing import Any, Callable, Dict
+
+# 路线偏好：名称 -> 由路径计算代价的函数
+WEIGHT_PROFILES: Dict[str, Callable[[Any], float]] = {
+    'shortest': attrgetter('length'),  # 路程最短
+    'fastest': attrgetter('time_cost'),  # 用时最少
+    'least_effort': lambda edge: edge.length * edge.difficulty,  # 少走楼梯和斜坡
+}
+DEFAULT_PROFILE = 'shortest'
+
+
+def cost_function(weight: str) -> Callable[[Any], float]:
+    """偏好名称或路径属性名（如 'length'、'time_cost'）对应的代价函数"""
+    return WEIGHT_PROFILES.get(weight) or attrgetter(weight)
@@ -0,0 +1,471 @@
+import datetime
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from campus_graph import CampusGraph, EdgePosition
+from events import ACTIVITY_END, ACTIVITY_START, EDGE_ARRIVAL, STAY_END, EventQueue
+from itinerary import Itinerary, smooth_step
+from profiles import DEFAULT_PROFILE
+from traffic import CONGESTED_PROFILE, TrafficAssignment, wave_profile
+
+# 虚拟时间初始设定
+VIRTUAL_START_HOUR = 7
+VIRTUAL_START_MINUTE = 5
+VIRTUAL_START_SECOND = 0
+
+# 手工描点的坐标误差，距离小于它的点合并为同一个路口（0.005约5m）
+SNAP_TOLERANCE = 0.005
+# 同一对建筑之间的学生在前几条相近路线中分流
+ROUTE_ALTERNATIVES = 3
+
+
+@dataclass(frozen=True, order=True)
+class Point:
+    """坐标点类"""
+    __slots__ = ('x', 'y')
+    x: float
+    y: float
+
+    def to_screen_coords(self, bg_width: int, bg_height: int) -> Tuple[int, int]:
+        """转换为屏幕坐标"""
+        return (int(self.x * bg_width), int(self.y * bg_height))
+
+
+class Path:
+    __slots__ = ('id', 'start', 'end', 'length', 'time_cost', 'is_forward', 'difficulty', 'capacity')
+
+    def __init__(self, path_id: int, start: Point, end: Point, length: float, time_cost: float, is_forward: bool = True, difficulty: float = 1.0, capacity: float = 100):
+        self.id = path_id
+        self.start = start
+        self.end = end
+        self.length = length
+        self.time_cost = time_cost
+        self.is_forward = is_forward
+        self.difficulty = difficulty
+        self.capacity = capacity
+
+    def reverse(self) -> 'Path':
+        """生成反方向的路径"""
+        return Path(self.id, self.end, self.start, self.length, self.time_cost, is_forward=not self.is_forward, difficulty=self.difficulty, capacity=self.capacity)
+
+
+@lru_cache(maxsize=None)
+def parse_schedule(schedule: Tuple[Tuple[str, str, str, int], ...]) -> Tuple[Tuple[float, float, str, int], ...]:
+    """把 (开始'HH:MM', 结束'HH:MM', 建筑, 停留时间) 转成当天的秒数；同一份课表只解析一次，同班学生共享结果"""
+    # 获取当天0点时间，这里假设都为当年的1月1日
+    current_year = datetime.datetime.now().year
+    base_datetime = datetime.datetime(current_year, 1, 1)
+    parsed = []
+    for start_time, end_time, building_name, time_cost in schedule:
+        start_time_obj = datetime.datetime.strptime(start_time, '%H:%M').time()
+        end_time_obj = datetime.datetime.strptime(end_time, '%H:%M').time()
+
+        start_timestamp = (datetime.datetime.combine(base_datetime.date(), start_time_obj) - base_datetime).total_seconds()
+        end_timestamp = (datetime.datetime.combine(base_datetime.date(), end_time_obj) - base_datetime).total_seconds()
+
+        parsed.append((start_timestamp, end_timestamp, building_name, time_cost))
+    return tuple(parsed)
+
+
+class Student:
+    # 学生数量很大时每个实例省掉一个__dict__；路网、建筑表和课表都是共享的引用
+    __slots__ = (
+        'id', 'name', 'stay_time_remaining', 'class_name', 'dormitory', 'buildings', 'graph', 'profile',
+        'schedule', 'position', 'current_time', 'current_schedule_index', 'current_path', 'move_start_time',
+        'edge_position', 'edge_offset', 'route_request', 'trip', 'verbose', 'itinerary',
+    )
+
+    def __init__(self, student_id: int, name: str, class_name: str, dormitory: str, buildings: Dict[str, Point], graph: CampusGraph, schedule: List[Tuple[str, str, str, int]], profile: str = DEFAULT_PROFILE, verbose: bool = True):
+        self.id = student_id
+        self.name = name
+        self.stay_time_remaining = 0  
+        self.class_name = class_name
+        self.dormitory = dormitory
+        self.buildings = buildings
+        self.graph = graph
+        self.profile = profile  # 路线偏好：shortest、fastest 或 least_effort
+        self.schedule: Tuple[Tuple[float, float, str, int], ...] = ()
+        self.position: Optional[Point] = buildings[dormitory]
+        self.current_time: int = VIRTUAL_START_HOUR * 3600 + VIRTUAL_START_MINUTE * 60 + VIRTUAL_START_SECOND
+        self.current_schedule_index: int = 0
+        self.current_path: List[Path] = []
+        self.move_start_time: Optional[float] = None
+        # 走在路段中间时的位置 (边编号, 已走过的比例)，停在节点上时为None
+        self.edge_position: Optional[EdgePosition] = None
+        # 当前路段在开始计时前已经走过的比例，从路段中间重新规划时不为0
+        self.edge_offset = 0.0
+        # 待解决的寻路请求：(目标建筑, 请求时间, 到达后停留时间)
+        self.route_request: Optional[Tuple[str, float, float]] = None
+        # 行程编号：每次改变去向时加一，旧行程留在事件队列里的到达事件据此作废
+        self.trip = 0
+        # 全天行程：每次出发时写入整条路线，任意时刻的位置都可以直接查
+        self.itinerary = Itinerary(self.position)
+        self.verbose = verbose
+        self.set_schedule(schedule)  # 调用设置日程方法
+
+    def log(self, message: str):
+        """输出学生的行动日志，verbose为False时不输出"""
+        if self.verbose:
+            print(message)
+
+    def set_schedule(self, schedule: List[Tuple[str, str, str, int]]):
+        """根据传入的日程信息设置学生日程安排"""
+        self.schedule += parse_schedule(tuple(schedule))
+
+    def position_at(self, time: float) -> Point:
+        """行程中time时刻的位置，不改变学生当前的状态"""
+        return Point(*self.itinerary.coordinates_at(time))
+
+    def location(self):
+        """寻路用的当前位置：在路段中间时是EdgePosition，否则是坐标点"""
+        return self.edge_position or self.position
+
+    def request_route(self, building: str, current_time: float, stay_time: float):
+        """登记一次寻路请求，由Simulation.step在这一轮统一批量解决"""
+        self.current_path = []
+        self.route_request = (building, current_time, stay_time)
+
+    def start_route(self, path: List[Path], offset: float = 0.0) -> bool:
+        """批量寻路得到路线后开始移动，找不到路线时保持原地；offset为第一段路已走过的比例"""
+        building, current_time, stay_time = self.route_request
+        self.route_request = None
+        self.current_path = path
+        self.stay_time_remaining = stay_time
+        if self.current_path:
+            self.move_start_time = current_time
+            self.edge_offset = offset
+            self.log(f"{self.name} 开始前往 {building}")
+            return True
+        if not self.at_building(building):
+            self.log(f"{self.name} 无法前往 {building}")
+        return False
+
+    def at_building(self, building: str) -> bool:
+        """是否停在建筑所在的路口；按节点编号比较，建筑坐标被合并到附近路口时也成立"""
+        if self.edge_position is not None:
+            return False
+        node = self.graph.node_id(self.position)
+        return node is not None and node == self.graph.node_id(self.buildings[building])
+
+    def advance_to(self, current_time: float):
+        """把走在路上的学生的位置插值到current_time（不改变路线，只更新坐标和路段位置）"""
+        if not self.current_path:
+            return
+        path = self.current_path[0]
+        progress = min(1.0, self.edge_offset + (current_time - self.move_start_time) / path.time_cost)
+        self.position = Point(
+            path.start.x + (path.end.x - path.start.x) * smooth_step(progress),
+            path.start.y + (path.end.y - path.start.y) * smooth_step(progress)
+        )
+        self.edge_position = EdgePosition(self.graph.edge_index[path], progress) if progress < 1.0 else None
+
+    def finish_edge(self, current_time: float) -> Path:
+        """走完当前路段，停在它的终点，下一段路从现在开始计时"""
+        path = self.current_path.pop(0)
+        self.position = path.end
+        self.edge_position = None
+        self.move_start_time = current_time
+        self.edge_offset = 0.0
+        return path
+
+    def remaining_edge_time(self) -> float:
+        """走完当前路段还需要的时间"""
+        return (1 - self.edge_offset) * self.current_path[0].time_cost
+
+
+class Simulation:
+    """不依赖pygame的模拟核心：持有时钟、路网和所有学生，可以在服务器或测试里直接跑
+
+    时间按离散事件推进：活动开始、活动结束、走完一段路、停留结束都放进事件队列，
+    时钟直接跳到下一个事件，一天的开销只和事件数有关。
+    verbose为False时不打印学生日志，批量运行时能跑满CPU。
+    vectorized为True时路上学生的逐秒位置存放在agents.AgentStore（需要NumPy）里，step()一次向量化更新全部学生，
+    Student.position只在事件发生时更新，界面或统计应读取 agents.x / agents.y。
+    """
+
+    def __init__(self, data_file: str = 'data.json', verbose: bool = True, start_time: Optional[float] = None, vectorized: bool = False):
+        self.paths: List[Path] = []
+        self.students: List[Student] = []
+        self.buildings: Dict[str, Point] = {}
+        self.graph: Optional[CampusGraph] = None
+        self.verbose = verbose
+        if start_time is None:
+            start_time = VIRTUAL_START_HOUR * 3600 + VIRTUAL_START_MINUTE * 60 + VIRTUAL_START_SECOND
+        self.virtual_time = start_time  # 秒
+        self.events = EventQueue()
+        # 登记了寻路请求、等待本时刻统一寻路的学生
+        self.departures: List[Student] = []
+        # 出发波次（活动开始时间）-> 这一波的拥堵偏好名，选了拥堵偏好的学生按所去活动的波次寻路
+        self.wave_profiles: Dict[float, str] = {}
+        self.load_data(data_file)
+        for student in self.students:
+            self.schedule_activities(student)
+        # 向量化位置后端：学生 -> 在AgentStore中的下标
+        self.agents = None
+        self.agent_index: Dict[Student, int] = {}
+        if vectorized and self.graph is not None:
+            from agents import AgentStore  # NumPy只是可选依赖
+            self.agents = AgentStore(self.graph, len(self.students))
+            self.agent_index = {student: index for index, student in enumerate(self.students)}
+            self.agents.place(range(len(self.students)), [s.position.x for s in self.students], [s.position.y for s in self.students])
+
+    def log(self, message: str):
+        """输出加载路网时的报告，verbose为False时不输出"""
+        if self.verbose:
+            print(message)
+
+    def load_data(self, data_file: str = 'data.json'):
+        """从JSON加载数据"""
+        try:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                class_schedules = {}
+                class_profiles = {}
+                for class_info in data.get('class', []):
+                    class_name = class_info['class_name']
+                    class_profiles[class_name] = class_info.get('profile', DEFAULT_PROFILE)
+                    content = class_info['content'].split('-')
+                    schedule = []
+                    for i in range(0, len(content), 2):
+                        activity_name = content[i]
+                        building_name = None
+                        for subject in data.get('subjects', []):
+                            if subject['name'] == activity_name:
+                                building_name = subject['building']
+                                break
+                        if building_name:
+                            start_time = subject['start_time']
+                            end_time = subject['end_time']
+                            time_cost = subject['time_cost']
+                            schedule.append((start_time, end_time, building_name, time_cost))
+                    class_schedules[class_name] = schedule
+
+                # 相同坐标只保留一个Point，建筑和所有路段共享
+                points: Dict[Tuple[float, float], Point] = {}
+                for building_data in data.get('buildings', []):
+                    coordinates = self.point(points, building_data['coordinates'])
+                    self.buildings[building_data['name']] = coordinates
+                for path_data in data.get('paths', []):
+                    start = self.point(points, path_data['start_point'])
+                    end = self.point(points, path_data['end_point'])
+                    self.paths.append(Path(
+                        path_data['id'], start, end,
+                        path_data['length'], path_data['time_cost'],
+                        difficulty=path_data.get('difficulty', 1.0),
+                        capacity=path_data.get('capacity', 100)
+                    ))
+                self.graph = CampusGraph(self.paths, SNAP_TOLERANCE)  # 路网只构建一次，所有学生共享
+                if self.graph.merges or self.graph.dropped_paths:
+                    self.log(self.graph.merge_report())
+                # 学生可以单独指定路线偏好，否则沿用班级的偏好
+                student_profiles = [
+                    student_data.get('profile', class_profiles.get(student_data['class_name'], DEFAULT_PROFILE))
+                    for student_data in data.get('students', [])
+                ]
+                table_profiles = set(student_profiles) | {DEFAULT_PROFILE}
+                if CONGESTED_PROFILE in student_profiles:
+                    self.assign_traffic(data.get('students', []), class_schedules)
+                    table_profiles.discard(CONGESTED_PROFILE)
+                    table_profiles.update(self.wave_profiles.values())
+                # 建筑之间的路线按用到的偏好各预先算好一张表
+                self.graph.build_route_table(self.buildings, table_profiles)
+                self.log(self.graph.use_compiled_graph().report())  # 合并重复录入的路段，其余查询在精简路网上搜索
+                # data.json可以用 bridges 列出河上的桥（格式同paths的起终点），跨河路线改为查表
+                bridges = [(Point(*bridge['start_point']), Point(*bridge['end_point'])) for bridge in data.get('bridges', [])]
+                if bridges:
+                    self.graph.use_transit_nodes(bridges)
+                if self.graph.isolated_buildings():
+                    self.log(self.graph.connectivity_report())
+                self.graph.landmark_map_file = data_file  # 用到ALT时地标表按地图版本缓存在data.json旁边
+                for student_data, profile in zip(data.get('students', []), student_profiles):
+                    student_schedule = class_schedules.get(student_data['class_name'], [])
+                    student = Student(
+                        student_data['id'],
+                        student_data['name'],
+                        student_data['class_name'],
+                        student_data['dormitory'],
+                        self.buildings,
+                        self.graph,
+                        student_schedule,
+                        profile,
+                        self.verbose
+                    )
+                    self.students.append(student)
+
+        except FileNotFoundError:
+            print("数据文件未找到")
+
+    @staticmethod
+    def point(points: Dict[Tuple[float, float], Point], coordinates: List[float]) -> Point:
+        """按坐标取共享的Point"""
+        key = (coordinates[0], coordinates[1])
+        if key not in points:
+            points[key] = Point(*key)
+        return points[key]
+
+    def assign_traffic(self, students_data: List[Dict], class_schedules: Dict[str, List]):
+        """按出发波次做容量受限的均衡分配：同一时刻开始的活动的出行算一波，每波单独分配并注册
+        一种拥堵偏好，记在wave_profiles里；出行完全相同的波次共用同一次分配的结果"""
+        waves: Dict[float, Dict[Tuple[Point, Point], int]] = {}
+        for student_data in students_data:
+            previous = student_data['dormitory']
+            for start_time, _, building, _ in parse_schedule(tuple(class_schedules.get(student_data['class_name'], []))):
+                trips = waves.setdefault(start_time, {})
+                trip = (self.buildings[previous], self.buildings[building])
+                trips[trip] = trips.get(trip, 0) + 1
+                previous = building
+        solved: Dict[Tuple, str] = {}
+        for start_time, trips in sorted(waves.items()):
+            demand = tuple(sorted(trips.items()))
+            if demand not in solved:
+                solved[demand] = wave_profile(start_time)
+                assignment = TrafficAssignment(self.graph, [(start, end, volume) for (start, end), volume in demand], profile=solved[demand])
+                assignment.solve()
+                self.log(f"{solved[demand]} 拥堵分配完成，相对间隙 {assignment.relative_gap:.5f}")
+            self.wave_profiles[start_time] = solved[demand]
+
+    def route_profile(self, student: Student) -> str:
+        """学生这次出行寻路用的偏好：选了拥堵偏好的学生用所去活动那一波的拥堵用时"""
+        if student.profile != CONGESTED_PROFILE:
+            return student.profile
+        return self.wave_profiles.get(student.schedule[student.current_schedule_index][0], student.profile)
+
+    def schedule_activities(self, student: Student):
+        """把学生的活动开始和结束放进事件队列；已经开始的活动从当前时刻算起"""
+        for index, (start_time, end_time, _, _) in enumerate(student.schedule):
+            if end_time <= self.virtual_time:
+                continue
+            self.events.push(max(start_time, self.virtual_time), ACTIVITY_START, student, index)
+            self.events.push(end_time, ACTIVITY_END, student, index)
+
+    def step(self):
+        """推进一秒，并把路上的学生插值到当前时刻，供界面逐帧显示"""
+        self.run_until(self.virtual_time + 1)
+        if self.agents is not None:
+            self.agents.step(self.virtual_time)
+            return
+        for student in self.students:
+            student.advance_to(self.virtual_time)
+
+    def run_until(self, end_time: float):
+        """处理end_time（秒）之前的所有事件，时钟从一个事件直接跳到下一个"""
+        while self.events.next_time() <= end_time:
+            self.virtual_time, kind, student, data = self.events.pop()
+            self.handle_event(kind, student, data)
+            if self.events.next_time() > self.virtual_time:
+                self.resolve_routes()  # 同一时刻出发的学生一起寻路
+        self.virtual_time = max(self.virtual_time, end_time)
+
+    def handle_event(self, kind: str, student: Student, data):
+        """处理一个事件；EDGE_ARRIVAL和STAY_END带行程编号，改变去向后的旧事件直接忽略"""
+        now = self.virtual_time
+        if kind == ACTIVITY_START:
+            # 新活动开始时无论在做什么都动身前往，在路段中间就从当前位置重新规划
+            start_time, end_time, building, duration = student.schedule[data]
+            student.current_schedule_index = data
+            student.trip += 1
+            student.advance_to(now)
+            if student.route_request is None:
+                self.departures.append(student)
+            student.request_route(building, now, duration)
+        elif kind == ACTIVITY_END:
+            student.log(f"{student.name} 活动结束: {student.schedule[data][2]}")
+        elif kind == EDGE_ARRIVAL:
+            if data != student.trip:
+                return
+            student.finish_edge(now)
+            if student.current_path:
+                self.events.push(now + student.remaining_edge_time(), EDGE_ARRIVAL, student, student.trip)
+            elif student.at_building(student.schedule[student.current_schedule_index][2]):
+                self.arrive(student)
+            # 否则是道路变化后找不到新路线的行程，停在这段路的终点等下一个活动
+        elif kind == STAY_END:
+            if data == student.trip:
+                student.stay_time_remaining = 0
+                student.log(f"{student.name} 停留结束，等待下一个活动")
+
+    def arrive(self, student: Student):
+        """到达活动地点，停留到停留时间用完或活动结束"""
+        now = self.virtual_time
+        end_time, building = student.schedule[student.current_schedule_index][1:3]
+        student.log(f"{student.name} 到达 {building}")
+        self.events.push(min(now + student.stay_time_remaining, max(end_time, now)), STAY_END, student, student.trip)
+
+    def resolve_routes(self):
+        """这一时刻要出发的学生一起寻路：按路线偏好分组，同一起点只搜索一次；只看登记过的学生，不扫描全部学生"""
+        waiting: Dict[str, List[Student]] = {}
+        for student in self.departures:
+            waiting.setdefault(self.route_profile(student), []).append(student)
+        self.departures = []
+        for profile, students in waiting.items():
+            requests = [(student.location(), self.buildings[student.route_request[0]]) for student in students]
+            paths = self.graph.route_many(requests, profile=profile, alternatives=ROUTE_ALTERNATIVES)
+            started: List[Student] = []
+            for student, (origin, _), path in zip(students, requests, paths):
+                offset = self.graph.start_offset(origin, path)
+                student.itinerary.follow(self.virtual_time, student.position, path, offset)
+                if student.start_route(path, offset):
+                    self.events.push(self.virtual_time + student.remaining_edge_time(), EDGE_ARRIVAL, student, student.trip)
+                    started.append(student)
+                else:
+                    if self.agents is not None:
+                        self.agents.place([self.agent_index[student]], student.position.x, student.position.y)
+                    if student.at_building(student.schedule[student.current_schedule_index][2]):
+                        self.arrive(student)  # 已经在目的地
+            if self.agents is not None and started:
+                self.agents.assign_routes(
+                    [self.agent_index[student] for student in started],
+                    [[self.graph.edge_index[path] for path in student.current_path] for student in started],
+                    self.virtual_time,
+                    [student.edge_offset for student in started]
+                )
+
+    def compile_day(self, end_time: float = 24 * 3600):
+        """把到end_time为止的事件一次处理完，每个学生的全天行程随之确定，之后可以用positions_at查询任意时刻"""
+        self.run_until(end_time)
+
+    def positions_at(self, time: float) -> List[Point]:
+        """所有学生在time时刻的位置（由行程直接算出，不用逐秒重放）"""
+        return [student.position_at(time) for student in self.students]
+
+    def close_path(self, start: Point, end: Point):
+        """运行时封闭一段路（例如桥梁中午关闭），只重新规划路线经过它的学生"""
+        self.replan_students(self.graph.close_path(start, end))
+
+    def reopen_path(self, start: Point, end: Point):
+        """重新开放一段路；已经在路上的学生不受影响"""
+        self.replan_students(self.graph.reopen_path(start, end))
+
+    def set_path_cost(self, start: Point, end: Point, cost: float, profile: str = DEFAULT_PROFILE):
+        """修改一段路在某种偏好下的代价"""
+        self.replan_students(self.graph.set_edge_cost(self.graph.edge_ids_between(start, end), cost, profile))
+
+    def replan_students(self, changed: Set[int]):
+        """剩余路线经过变化的边的学生，走完当前这段路后改走新路线"""
+        changed_paths = {self.graph.edge_list[edge_id] for edge_id in changed}
+        waiting: Dict[str, List[Student]] = {}
+        for student in self.students:
+            if any(path in changed_paths for path in student.current_path[1:]):
+                waiting.setdefault(self.route_profile(student), []).append(student)
+        for profile, students in waiting.items():
+            requests = [(student.current_path[0].end, student.current_path[-1].end) for student in students]
+            for student, path in zip(students, self.graph.route_many(requests, profile=profile)):
+                building = student.schedule[student.current_schedule_index][2]
+                student.current_path = student.current_path[:1] + path
+                # 当前这段路走完的时刻起改走新路线
+                edge_end = student.move_start_time + student.remaining_edge_time()
+                student.itinerary.follow(edge_end, student.current_path[0].end, path)
+                if not path:
+                    student.log(f"{student.name} 无法前往 {building}")
+                else:
+                    student.log(f"{student.name} 因道路变化重新规划路线")
+            if self.agents is not None:
+                # 当前路段的计时不变，只换掉后面的路线
+                self.agents.assign_routes(
+                    [self.agent_index[student] for student in students],
+                    [[self.graph.edge_index[path] for path in student.current_path] for student in students],
+                    [student.move_start_time for student in students],
+                    [student.edge_offset for student in students]
+                )
@@ -0,0 +1,69 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class GridIndex:
+    """均匀网格空间索引：每个格子记录落在其中的节点编号，邻近查询平均O(1)"""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.ids: List[int] = []
+        # 已占用格子的范围，用来限制扩圈次数
+        self.min_cell = (math.inf, math.inf)
+        self.max_cell = (-math.inf, -math.inf)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, node: int, x: float, y: float):
+        """加入一个节点"""
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, []).append(len(self.ids))
+        self.min_cell = (min(self.min_cell[0], cell[0]), min(self.min_cell[1], cell[1]))
+        self.max_cell = (max(self.max_cell[0], cell[0]), max(self.max_cell[1], cell[1]))
+        self.xs.append(x)
+        self.ys.append(y)
+        self.ids.append(node)
+
+    def _ring(self, cx: int, cy: int, radius: int) -> Iterator[int]:
+        """第radius圈格子里的所有条目"""
+        for gx in range(cx - radius, cx + radius + 1):
+            for gy in range(cy - radius, cy + radius + 1):
+                if max(abs(gx - cx), abs(gy - cy)) == radius:
+                    yield from self.cells.get((gx, gy), ())
+
+    def nearest(self, x: float, y: float, max_distance: float = math.inf) -> Optional[Tuple[int, float]]:
+        """最近的节点 (编号, 距离)，超出max_distance时返回None"""
+        if not self.ids:
+            return None
+        cx, cy = self._cell(x, y)
+        best: Optional[Tuple[int, float]] = None
+        radius = 0
+        # 所有格子都落在这个范围内，超过后不用再扩圈
+        max_radius = max(
+            abs(cx - self.min_cell[0]), abs(cx - self.max_cell[0]),
+            abs(cy - self.min_cell[1]), abs(cy - self.max_cell[1])
+        )
+        while radius <= max_radius:
+            # 第radius圈上的点距离至少是 (radius - 1) * cell_size
+            ring_distance = (radius - 1) * self.cell_size
+            if ring_distance > max_distance or (best is not None and ring_distance > best[1]):
+                break
+            for entry in self._ring(cx, cy, radius):
+                distance = math.hypot(self.xs[entry] - x, self.ys[entry] - y)
+                if distance <= max_distance and (best is None or distance < best[1]):
+                    best = (self.ids[entry], distance)
+            radius += 1
+        return best
+
+
+@dataclass(frozen=True)
+class NodeMerge:
+    """一次合并记录：坐标为point的点被并入了已有节点target"""
+    point: Any
+    target: Any
+    distance: float
@@ -0,0 +1,57 @@
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulation import Path, Point, Simulation, Student  # noqa: E402
+
+DATA_FILE = os.path.join(ROOT, '001', 'data.json')
+COUNT = 10000
+# 每个对象允许的字节数上限（Python 3.11实测：学生约550，路径约105，坐标点约57）；
+# 去掉 __slots__ 后每个实例多一个__dict__，会超过这些上限
+STUDENT_BYTES = 590
+PATH_BYTES = 120
+POINT_BYTES = 64
+
+
+def measure(create, count: int = COUNT) -> float:
+    """创建count个对象，用tracemalloc统计平均每个对象新增的字节数"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [create(index) for index in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del objects
+    return used / count
+
+
+def test_memory_per_student():
+    """按001/data.json里第一个学生再创建一批学生；路网、建筑表和课表都是共享的，只统计学生自己的状态"""
+    simulation = Simulation(DATA_FILE, verbose=False)
+    template = simulation.students[0]
+
+    def create(_):
+        student = Student(template.id, template.name, template.class_name, template.dormitory,
+                          simulation.buildings, simulation.graph, [], template.profile, False)
+        student.schedule = template.schedule
+        return student
+
+    per_student = measure(create)
+    print(f"每个学生约 {per_student:.0f} 字节")
+    assert not hasattr(create(0), '__dict__')
+    assert per_student < STUDENT_BYTES
+
+
+def test_memory_per_path():
+    start, end = Point(0.0, 0.0), Point(1.0, 1.0)
+    assert not hasattr(Path(1, start, end, 1.0, 1.0), '__dict__')
+    assert measure(lambda _: Path(1, start, end, 1.0, 1.0)) < PATH_BYTES
+
+
+def test_memory_per_point():
+    assert not hasattr(Point(0.25, 0.5), '__dict__')
+    assert measure(lambda _: Point(0.25, 0.5)) < POINT_BYTES
@@ -0,0 +1,113 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Tuple
+
+# BPR路阻函数参数：t = t0 * (1 + ALPHA * (流量 / 容量) ** BETA)
+BPR_ALPHA = 0.15
+BPR_BETA = 4
+# 拥堵用时以这个名字注册到CampusGraph，学生可以在data.json里选它作为路线偏好
+CONGESTED_PROFILE = 'congested'
+
+
+def wave_profile(start_time: float) -> str:
+    """某个出发波次（在start_time开始的活动）的拥堵用时注册到CampusGraph时用的名字"""
+    return f"{CONGESTED_PROFILE}@{int(start_time)}"
+
+
+def bpr_time(free_time: float, flow: float, capacity: float) -> float:
+    """容量相关的通行时间"""
+    if capacity <= 0:
+        return free_time
+    return free_time * (1 + BPR_ALPHA * (flow / capacity) ** BPR_BETA)
+
+
+class TrafficAssignment:
+    """用户均衡交通分配：把换课时段的出行量分配到路网上，让拥堵后的用时达到均衡
+
+    trips 是 (起点, 终点, 人数) 的序列，起终点为坐标点；这些出行应当是同一时段的，
+    不同时段的人流互不影响，混在一起分配会把全天的人流叠加到同一个时刻。
+    结果注册为名叫profile的偏好。
+    全有全无分配按起点分组，每个起点每轮只做一次单源搜索，所以几万次出行也只需要
+    “不同起点数”次搜索。
+    """
+
+    def __init__(self, graph: Any, trips: Iterable[Tuple[Any, Any, float]], base_profile: str = 'fastest', profile: str = CONGESTED_PROFILE):
+        self.graph = graph
+        self.profile = profile
+        self.free_times = array('d', graph.edge_costs(base_profile))
+        self.capacities = array('d', (getattr(edge, 'capacity', 0) for edge in graph.edge_list))
+        # 起点编号 -> {终点编号: 人数}
+        self.demand: Dict[int, Dict[int, float]] = {}
+        for start, end, volume in trips:
+            origin, destination = graph.node_id(start), graph.node_id(end)
+            if origin is None or destination is None or origin == destination:
+                continue
+            destinations = self.demand.setdefault(origin, {})
+            destinations[destination] = destinations.get(destination, 0) + volume
+        self.flows = array('d', [0.0]) * len(graph.edge_list)
+        self.relative_gap = float('inf')
+
+    def travel_times(self, flows: array) -> array:
+        """给定流量下每条边的通行时间"""
+        return array('d', (
+            bpr_time(free_time, flow, capacity)
+            for free_time, flow, capacity in zip(self.free_times, flows, self.capacities)
+        ))
+
+    def all_or_nothing(self, times: array) -> array:
+        """按当前用时把所有出行量都放到各自的最短路上"""
+        self.graph.register_profile(self.profile, times)
+        flows = array('d', [0.0]) * len(times)
+        for origin, destinations in self.demand.items():
+            _, predecessors, settled = self.graph.dijkstra(origin, -1, self.profile)
+            for destination, volume in destinations.items():
+                if not settled[destination]:
+                    continue
+                node = destination
+                while node != origin:
+                    edge_id = predecessors[node]
+                    flows[edge_id] += volume
+                    node = self.graph.edge_sources[edge_id]
+        return flows
+
+    def _line_search(self, flows: array, target: array, steps: int = 20) -> float:
+        """二分法求Beckmann目标函数沿 target - flows 方向的最优步长"""
+        low, high = 0.0, 1.0
+        for _ in range(steps):
+            middle = (low + high) / 2
+            slope = 0.0
+            for free_time, flow, goal, capacity in zip(self.free_times, flows, target, self.capacities):
+                direction = goal - flow
+                if direction:
+                    slope += direction * bpr_time(free_time, flow + middle * direction, capacity)
+            if slope > 0:
+                high = middle
+            else:
+                low = middle
+        return (low + high) / 2
+
+    def solve(self, iterations: int = 50, tolerance: float = 1e-4, method: str = 'frank_wolfe') -> array:
+        """迭代到相对间隙小于tolerance；method为 'frank_wolfe' 或 'msa'（逐次平均）"""
+        if method not in ('frank_wolfe', 'msa'):
+            raise ValueError(f"未知的分配方法: {method}")
+        flows = self.all_or_nothing(self.free_times)
+        for iteration in range(1, iterations + 1):
+            times = self.travel_times(flows)
+            target = self.all_or_nothing(times)
+            total = sum(flow * time for flow, time in zip(flows, times))
+            best = sum(goal * time for goal, time in zip(target, times))
+            self.relative_gap = (total - best) / total if total > 0 else 0.0
+            if self.relative_gap < tolerance:
+                break
+            if method == 'msa':
+                step = 1.0 / (iteration + 1)
+            else:
+                step = self._line_search(flows, target)
+            flows = array('d', (flow + step * (goal - flow) for flow, goal in zip(flows, target)))
+        self.flows = flows
+        # 最终的拥堵用时留在图上，之后按 self.profile 查路线都会用它
+        self.graph.register_profile(self.profile, self.travel_times(flows))
+        return flows
+
+    def congested_times(self) -> List[float]:
+        """均衡状态下每条边的通行时间，按边编号索引"""
+        return list(self.travel_times(self.flows))
@@ -0,0 +1,124 @@
+import heapq
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from components import UnionFind
+from profiles import DEFAULT_PROFILE
+
+INF = math.inf
+
+
+class TransitRouter:
+    """过境节点路由：用几条分隔边（例如河上的四座桥）把路网切成几块
+
+    去掉分隔边后每块是一个连通分量，分隔边的端点就是过境节点。预处理时记下
+    每个节点在本侧到各过境节点的距离，以及过境节点之间在整张图上的距离。
+    跨河的路线必然经过某个桥，所以只要在两侧过境节点之间做至多 4×4 次查表；
+    同侧的查询仍然在原图上搜索。
+    """
+
+    def __init__(self, graph: Any, separator_edges: Iterable[int], weight: str = DEFAULT_PROFILE):
+        self.graph = graph
+        self.weight = weight
+        self.separators: Set[int] = set(separator_edges)
+        count = graph.node_count
+        components = UnionFind(count)
+        for edge_id in range(len(graph.edge_list)):
+            if edge_id not in self.separators:
+                components.union(graph.edge_sources[edge_id], graph.edge_targets[edge_id])
+        self.side = array('l', (components.find(node) for node in range(count)))
+
+        self.access: List[int] = sorted({graph.edge_sources[e] for e in self.separators} | {graph.edge_targets[e] for e in self.separators})
+        # 每个过境节点一组表：本侧节点到它的距离/下一条边，它到本侧节点的距离/前驱边
+        self.to_access: List[Tuple[List[float], List[int]]] = []
+        self.from_access: List[Tuple[List[float], List[int]]] = []
+        # 过境节点在整张图上出发的最短路径树，用来求过境节点之间的距离和路线
+        self.transit_trees: List[Tuple[List[float], List[int]]] = []
+        for node in self.access:
+            self.to_access.append(self._side_search(node, reverse=True))
+            self.from_access.append(self._side_search(node, reverse=False))
+            distances, predecessors, _ = graph.dijkstra(node, weight=weight)
+            self.transit_trees.append((distances, predecessors))
+        # 每一侧的过境节点下标
+        self.side_access: Dict[int, List[int]] = {}
+        for index, node in enumerate(self.access):
+            self.side_access.setdefault(self.side[node], []).append(index)
+
+    def _side_search(self, source: int, reverse: bool) -> Tuple[List[float], List[int]]:
+        """不经过分隔边的单源搜索，只覆盖source所在的一侧"""
+        offsets, targets, edge_ids, costs = self.graph.csr(self.weight, reverse)
+        distances = [INF] * self.graph.node_count
+        predecessors = [-1] * self.graph.node_count
+        distances[source] = 0.0
+        queue = [(0.0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            for k in range(offsets[node], offsets[node + 1]):
+                if edge_ids[k] in self.separators:
+                    continue
+                neighbor = targets[k]
+                candidate = distance + costs[k]
+                if candidate < distances[neighbor]:
+                    distances[neighbor] = candidate
+                    predecessors[neighbor] = edge_ids[k]
+                    heapq.heappush(queue, (candidate, neighbor))
+        return distances, predecessors
+
+    def crosses(self, source: int, target: int) -> bool:
+        """两点是否在分隔边的两侧"""
+        return self.side[source] != self.side[target]
+
+    def distance(self, source: int, target: int) -> float:
+        """跨侧查询只查表；同侧返回inf，由调用方自己搜索"""
+        return self._best_transit(source, target)[0]
+
+    def _best_transit(self, source: int, target: int) -> Tuple[float, int, int]:
+        """(最短距离, 出发侧过境节点下标, 到达侧过境节点下标)"""
+        best = (INF, -1, -1)
+        if not self.crosses(source, target):
+            return best
+        for i in self.side_access.get(self.side[source], ()):
+            head = self.to_access[i][0][source]
+            if head == INF:
+                continue
+            transit = self.transit_trees[i][0]
+            for j in self.side_access.get(self.side[target], ()):
+                total = head + transit[self.access[j]] + self.from_access[j][0][target]
+                if total < best[0]:
+                    best = (total, i, j)
+        return best
+
+    def query_edge_ids(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        """跨侧时返回 (距离, 边编号列表)，不可达时为 (inf, [])；同侧返回None"""
+        if not self.crosses(source, target):
+            return None
+        total, i, j = self._best_transit(source, target)
+        if i < 0:
+            return INF, []
+        graph = self.graph
+        edge_ids: List[int] = []
+        # 起点沿本侧走到出发过境节点
+        next_edges = self.to_access[i][1]
+        node = source
+        while node != self.access[i]:
+            edge_id = next_edges[node]
+            edge_ids.append(edge_id)
+            node = graph.edge_targets[edge_id]
+        # 过境节点之间（整张图上的最短路）以及到达侧走到终点，都从后往前回溯
+        tail: List[int] = []
+        node = target
+        predecessors = self.from_access[j][1]
+        while node != self.access[j]:
+            edge_id = predecessors[node]
+            tail.append(edge_id)
+            node = graph.edge_sources[edge_id]
+        predecessors = self.transit_trees[i][1]
+        while node != self.access[i]:
+            edge_id = predecessors[node]
+            tail.append(edge_id)
+            node = graph.edge_sources[edge_id]
+        edge_ids.extend(reversed(tail))
+        return total, edge_ids